@@ -1,6 +1,7 @@
 import os
-import requests
-import PyPDF2
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import httpx  # ✅ ADD THIS LINE
 from dotenv import load_dotenv
 from flask import Flask, request, jsonify, render_template, session
@@ -8,11 +9,23 @@ if not hasattr(Flask, 'session_cookie_name'):
     Flask.session_cookie_name = property(lambda self: self.config.get('SESSION_COOKIE_NAME', 'session'))
 from flask_cors import CORS
 from flask_session import Session
-from urllib.parse import quote
 from openai import OpenAI
 import openai
 import boto3
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError, PartialCredentialsError
+from engine import RetrievalEngine, provenance
+from knowledge import PdfIngestor, SceneSnapshot, SyncWorker, TipsSnapshot, single_flight
+from mirror_store import NOTION_MIRROR_PATH, MirrorStore
+from notion_api import NotionClient
+from retrieval import pack_context, packing_metrics
+from snapshot_file import KNOWLEDGE_SNAPSHOT_PATH, load_snapshot
+from text_cache import TextCache, content_hash, source_key
+from webhooks import NOTION_WEBHOOK_SECRET, NotionWebhookHandler, verify_signature
+
+# Spawned PDF extraction workers (see pdf_text.extraction_pool) re-run the main script as
+# __mp_main__ before taking work. Under `python app.py` that is this file, so they skip
+# the startup below: no S3 check or snapshot load per child.
+POOL_WORKER = __name__ == "__mp_main__"
 
 print("✅ OpenAI version:", openai.__version__)
 print("✅ httpx version:", httpx.__version__)
@@ -36,6 +49,7 @@ aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
 aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
 s3_bucket_name = os.getenv('S3_BUCKET_NAME')
 aws_default_region = os.getenv('AWS_DEFAULT_REGION')
+openai_model = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
 
 from openai import OpenAI
 client = OpenAI(api_key=openai_api_key, http_client=None)
@@ -63,13 +77,152 @@ s3_client = boto3.client(
 )
 
 # Test the S3 client
-try:
-    response = s3_client.list_buckets()
-    print("S3 Buckets:")
-    for bucket in response['Buckets']:
-        print(f"  {bucket['Name']}")
-except Exception as e:
-    print(f"Error listing S3 buckets: {e}")
+if not POOL_WORKER:
+    try:
+        response = s3_client.list_buckets()
+        print("S3 Buckets:")
+        for bucket in response['Buckets']:
+            print(f"  {bucket['Name']}")
+    except Exception as e:
+        print(f"Error listing S3 buckets: {e}")
+
+# Shared, pooled Notion client used for every Notion call in the app
+notion = NotionClient(notion_token)
+
+# SQLite mirror of both databases, shared by every worker on this host
+mirror = MirrorStore(NOTION_MIRROR_PATH) if NOTION_MIRROR_PATH else None
+
+# Process-wide snapshots of both Notion databases; endpoints read from these
+pdf_ingestor = PdfIngestor(store=mirror) if os.getenv('TIPS_INGEST_PDFS', 'true').lower() == 'true' else None
+tips_snapshot = TipsSnapshot(notion, notion_database_id, store=mirror, pdf_ingestor=pdf_ingestor)
+scene_snapshot = SceneSnapshot(notion, notion_database_scene_id, store=mirror)
+
+# Boot from a snapshot baked at deploy time, so a new worker doesn't have to crawl Notion
+if not POOL_WORKER and KNOWLEDGE_SNAPSHOT_PATH and os.path.exists(KNOWLEDGE_SNAPSHOT_PATH):
+    load_snapshot(KNOWLEDGE_SNAPSHOT_PATH, tips_snapshot, scene_snapshot, pdf_ingestor)
+
+S3_SOURCE_PREFIX = f"s3:{s3_bucket_name}/"
+
+
+def fetch_scene_sidecar(key):
+    """
+    Return (content hash, text) from the `<key>.txt` the upload job stored next to one of our PDFs.
+    """
+    if not key.startswith(S3_SOURCE_PREFIX):
+        return None
+    try:
+        obj = s3_client.get_object(Bucket=s3_bucket_name, Key=f"{key[len(S3_SOURCE_PREFIX):]}.txt")
+    except (BotoCoreError, ClientError):
+        return None
+    digest = obj.get('Metadata', {}).get('sha256')
+    return (digest, obj['Body'].read().decode('utf-8')) if digest else None
+
+
+# Text extracted from scene PDFs, by content hash and by S3 key / file path
+scene_text_cache = TextCache(fetch_sidecar=fetch_scene_sidecar)
+
+# Uploaded scenes are parsed here, off the request path
+upload_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="scene-extract")
+
+
+def extract_uploaded_scene(s3_key, cache_key, file_data):
+    """
+    Extract an uploaded PDF into the text cache and store the text as `<s3_key>.txt` in S3,
+    so /scene_analysis on any host can skip the download and parse.
+    """
+    try:
+        digest, text = scene_text_cache.ingest(cache_key, file_data)
+        s3_client.put_object(Bucket=s3_bucket_name, Key=f"{s3_key}.txt", Body=text.encode('utf-8'),
+                             ContentType='text/plain; charset=utf-8', Metadata={'sha256': digest})
+        print(f"✅ Extracted {len(text)} characters from {s3_key}")
+    except Exception as e:
+        print(f"⚠️ Warning: Could not extract text from upload {s3_key}: {e}")
+
+# Notion change events refresh just the affected pages, see /webhooks/notion
+webhook_handler = NotionWebhookHandler([tips_snapshot, scene_snapshot])
+
+sync_worker = None
+
+# Set once this worker has warmed its caches; /ready reports 503 until then
+ready = threading.Event()
+prewarm_status = {}
+_background_pid = None
+
+
+def prewarm():
+    """
+    Load the knowledge snapshots, build the tips index and open the Notion and
+    OpenAI connection pools, so the first users don't pay for a cold worker.
+    """
+    steps = [
+        ("acting_tips", tips_snapshot.warm),
+        ("scene_analysis", scene_snapshot.ensure_fresh),
+        ("openai", lambda: client.models.retrieve(openai_model)),
+    ]
+    for name, step in steps:
+        start = time.monotonic()
+        try:
+            step()
+            prewarm_status[name] = f"ok in {time.monotonic() - start:.2f}s"
+        except Exception as e:
+            # A failed step only means the first request for it will be slow
+            prewarm_status[name] = f"failed: {e}"
+            print(f"⚠️ Prewarm step {name} failed: {e}")
+    ready.set()
+    print(f"✅ Prewarm finished: {prewarm_status}")
+
+
+def start_background_tasks():
+    """
+    Start the sync worker and prewarm for this process. Nothing starts at
+    import, so a `gunicorn --preload` master never runs Notion calls or holds
+    locks across the fork: `python app.py` calls this before serving and
+    gunicorn's post_fork hook calls it in every worker.
+    """
+    global _background_pid, sync_worker
+    if _background_pid == os.getpid():
+        return
+    _background_pid = os.getpid()
+    ready.clear()
+    prewarm_status.clear()
+
+    # Optionally keep the snapshots mirrored from a background thread so requests never block on Notion
+    if os.getenv('NOTION_SYNC_WORKER', 'false').lower() == 'true':
+        sync_worker = SyncWorker([tips_snapshot, scene_snapshot])
+        sync_worker.start()
+        print("✅ Background Notion sync worker started.")
+
+    if os.getenv('PREWARM_ON_STARTUP', 'true').lower() == 'true':
+        threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
+    else:
+        ready.set()
+
+
+MENTOR_SYSTEM_PROMPT = "You are an acting mentor AI. Use the following information to help answer questions from the user: {notion_summary}"
+MENTOR_MAX_TOKENS = 150
+NO_TIPS_MESSAGE = "I couldn't find any relevant information in the Acting Tips database."
+
+# Ranks and packs the tips context for both mentor endpoints
+retrieval_engine = RetrievalEngine(tips_snapshot, openai_model, MENTOR_SYSTEM_PROMPT, MENTOR_MAX_TOKENS)
+
+
+def ask_mentor(question):
+    """
+    Answer a question from the most relevant Acting Tips. Returns (answer, retrieval).
+    """
+    retrieval = retrieval_engine.retrieve(question)
+    if not retrieval.chunks:
+        return NO_TIPS_MESSAGE, retrieval
+
+    response = client.chat.completions.create(
+        model=openai_model,
+        messages=[
+            {"role": "system", "content": retrieval_engine.system_prompt(retrieval)},
+            {"role": "user", "content": question}
+        ],
+        max_tokens=MENTOR_MAX_TOKENS
+    )
+    return response.choices[0].message.content, retrieval
 
 # Flask app setup
 app = Flask(__name__, template_folder='templates')
@@ -81,31 +234,6 @@ app.config['SESSION_COOKIE_NAME'] = 'sac-session'  # ✅ Optional but recommende
 Session(app)
 CORS(app)  # Enable CORS for all routes
 
-def extract_text_from_pdf(file_url):
-    """
-    Extract text from a PDF file given its URL.
-    """
-    try:
-        response = requests.get(file_url)
-        response.raise_for_status()
-
-        with open('/tmp/temp.pdf', 'wb') as f:
-            f.write(response.content)
-
-        # Extract text from the PDF using PyPDF2
-        with open('/tmp/temp.pdf', 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            text = ""
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text
-
-        return text
-    except requests.exceptions.RequestException as e:
-        print(f"Error downloading PDF file: {e}")
-        return None
-
 def upload_file_to_s3(file_name, file_content):
     """
     Uploads a file to AWS S3 and returns the public URL.
@@ -128,69 +256,9 @@ def home():
             if not user_question:
                 raise ValueError("No question provided")
 
-            # Query Notion database for Acting Tips
-            notion_response = requests.post(
-                f"https://api.notion.com/v1/databases/{quote(notion_database_id)}/query",
-                headers={
-                    "Authorization": f"Bearer {notion_token}",
-                    "Content-Type": "application/json",
-                    "Notion-Version": "2022-06-28",
-                },
-            )
-
-            notion_data = notion_response.json()
-            if notion_response.status_code != 200:
-                raise ValueError(f"Notion API error: {notion_data}")
-
-            # Extract relevant information
-            relevant_info = []
-            for page in notion_data.get('results', []):
-                page_id = page.get('id')
-                if page_id:
-                    page_response = requests.get(
-                        f"https://api.notion.com/v1/blocks/{quote(page_id)}/children",
-                        headers={
-                            "Authorization": f"Bearer {notion_token}",
-                            "Notion-Version": "2022-06-28",
-                        },
-                    )
-                    if page_response.status_code == 200:
-                        page_content = page_response.json()
-                        for block in page_content.get("results", []):
-                            if block.get("type") == "paragraph":
-                                text = block["paragraph"]["rich_text"]
-                                if text:
-                                    relevant_info.append("".join([t["text"]["content"] for t in text]))
-                            elif block.get("type") == "file":
-                                file_data = block["file"]
-                                file_url = None
-                                if file_data["type"] == "external":
-                                    file_url = file_data["external"]["url"]
-                                elif file_data["type"] == "file":
-                                    file_url = file_data["file"]["url"]
-                                if file_url:
-                                    relevant_info.append(f"File URL: {file_url}")
-                    else:
-                        print(f"Error fetching page content: {page_response.status_code}, {page_response.json()}")
-
-            if not relevant_info:
-                answer = "I couldn't find any relevant information in the Acting Tips database."
-                return render_template('index.html', answer=answer, error_message=error_message)
-
-            notion_summary = " ".join(relevant_info)
-
-            # Generate AI response using OpenAI (new API)
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": f"You are an acting mentor AI. Use the following information to help answer questions from the user: {notion_summary}"},
-                    {"role": "user", "content": user_question}
-                ],
-                max_tokens=150
-            )
-            answer = response.choices[0].message.content
-
-        except requests.exceptions.RequestException as e:
+            answer, _ = ask_mentor(user_question)
+
+        except httpx.HTTPError as e:
             error_message = f"Error retrieving data from Notion: {e}"
         except ValueError as e:
             error_message = str(e)
@@ -202,28 +270,12 @@ def home():
 @app.route('/scene_analysis', methods=['GET'])
 def scene_analysis():
     try:
-        # Query the Scene Analysis database to get the latest uploaded scene
-        notion_response = requests.post(
-            f"https://api.notion.com/v1/databases/{quote(notion_database_scene_id)}/query",
-            headers={
-                "Authorization": f"Bearer {notion_token}",
-                "Content-Type": "application/json",
-                "Notion-Version": "2022-06-28",
-            },
-            json={
-                "sorts": [{"property": "Created time", "direction": "descending"}],
-                "page_size": 1
-            }
-        )
-
-        notion_data = notion_response.json()
-        print(f"Notion Response Data: {notion_data}")
-        if notion_response.status_code != 200:
-            raise ValueError(f"Scene Analysis API error: {notion_data}")
-
-        # Extract the latest scene entry
-        latest_scene = notion_data.get('results', [])[0]
+        # Get the latest uploaded scene from the Scene Analysis snapshot
+        latest_scene = scene_snapshot.latest_scene()
         print(f"Latest Scene Data: {latest_scene}")
+        if latest_scene is None:
+            return jsonify({'message': "No scenes found in the Scene Analysis database."})
+
         title = latest_scene.get('properties', {}).get('Title', {}).get('title', [])
         upload_scene = latest_scene.get('properties', {}).get('Upload Scene', {})
 
@@ -236,36 +288,46 @@ def scene_analysis():
         if not files:
             return jsonify({'error': "No files found in the Upload Scene property."}), 500
 
-        for file in files:
-            try:
-                print(f"File Data: {file}")
-                file_url = None
-                if file["type"] == "file" and "file" in file:
-                    file_url = file["file"].get("url")
-                elif file["type"] == "external" and "external" in file:
-                    file_url = file["external"].get("url")
-                if not file_url:
-                    raise KeyError("File URL not found")
-                
-                scene_content += f"File: {file_url}\n"
-                print(f"Extracting text from PDF: {file_url}")
-
-                # Extract text from the PDF file
-                extracted_text = extract_text_from_pdf(file_url)
-                if extracted_text is None:
-                    return jsonify({'error': f"Error extracting text from PDF: Unable to download the file from {file_url}."}), 500
-                scene_content += f"Extracted Text: {extracted_text}\n"
-
-            except KeyError as e:
-                print(f"Error accessing file URL: {e}")
-                return jsonify({'error': f"Error accessing file URL: {e}"}), 500
-            except Exception as e:
-                print(f"Error extracting text from PDF: {e}")
-                return jsonify({'error': f"Error extracting text from PDF: {e}"}), 500
+        # Reuse text extracted earlier for this version of the scene, if the mirror has it
+        scene_id = latest_scene.get('id')
+        last_edited_time = latest_scene.get('last_edited_time')
+        cached_text = mirror.scene_text(scene_id, last_edited_time) if mirror else None
+        if cached_text is not None:
+            scene_content += cached_text
+        else:
+            files_start = len(scene_content)
+            for file in files:
+                try:
+                    print(f"File Data: {file}")
+                    file_url = None
+                    if file["type"] == "file" and "file" in file:
+                        file_url = file["file"].get("url")
+                    elif file["type"] == "external" and "external" in file:
+                        file_url = file["external"].get("url")
+                    if not file_url:
+                        raise KeyError("File URL not found")
+
+                    scene_content += f"File: {file_url}\n"
+                    print(f"Extracting text from PDF: {file_url}")
+
+                    # Extract text from the PDF file, unless this file was extracted before
+                    extracted_text = scene_text_cache.extract(file_url, source_key(file_url, s3_bucket_name))
+                    if extracted_text is None:
+                        return jsonify({'error': f"Error extracting text from PDF: Unable to download the file from {file_url}."}), 500
+                    scene_content += f"Extracted Text: {extracted_text}\n"
+
+                except KeyError as e:
+                    print(f"Error accessing file URL: {e}")
+                    return jsonify({'error': f"Error accessing file URL: {e}"}), 500
+                except Exception as e:
+                    print(f"Error extracting text from PDF: {e}")
+                    return jsonify({'error': f"Error extracting text from PDF: {e}"}), 500
+            if mirror:
+                mirror.save_scene_text(scene_id, last_edited_time, scene_content[files_start:])
 
         # Generate leading questions using OpenAI (new API)
         response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+            model=openai_model,
             messages=[
                 {"role": "system", "content": "You are an AI that provides leading questions for actors based on scene content."},
                 {"role": "user", "content": f"Here is a scene: {scene_content} Provide a series of leading questions for an actor to help them understand key moments, key events for the characters, relationships, status, and stakes in this scene."}
@@ -283,23 +345,9 @@ def scene_analysis():
 @app.route('/questions', methods=['GET'])
 def get_questions():
     try:
-        # Query the Scene Analysis database for questions
-        notion_response = requests.post(
-            f"https://api.notion.com/v1/databases/{quote(notion_database_scene_id)}/query",
-            headers={
-                "Authorization": f"Bearer {notion_token}",
-                "Content-Type": "application/json",
-                "Notion-Version": "2022-06-28",
-            },
-        )
-
-        notion_data = notion_response.json()
-        if notion_response.status_code != 200:
-            raise ValueError(f"Notion API error: {notion_data}")
-
-        # Extract questions
+        # Read questions from the Scene Analysis snapshot
         questions = []
-        for page in notion_data.get('results', []):
+        for page in scene_snapshot.pages():
             for key, value in page.get('properties', {}).items():
                 if 'title' in value and value['title']:
                     questions.append(value['title'][0]['text']['content'])
@@ -350,68 +398,73 @@ def ask():
         return jsonify({'error': 'Question is required'}), 400
 
     try:
-        notion_response = requests.post(
-            f"https://api.notion.com/v1/databases/{quote(notion_database_id)}/query",
-            headers={
-                "Authorization": f"Bearer {notion_token}",
-                "Content-Type": "application/json",
-                "Notion-Version": "2022-06-28",
-            },
-        )
+        answer, retrieval = ask_mentor(question)
+        return jsonify({'response': answer, 'sources': provenance(retrieval)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        notion_data = notion_response.json()
-        if notion_response.status_code != 200:
-            return jsonify({'error': f"Notion API error: {notion_data}"}), 500
-
-        relevant_info = []
-        for page in notion_data.get('results', []):
-            page_id = page.get('id')
-            if page_id:
-                page_response = requests.get(
-                    f"https://api.notion.com/v1/blocks/{quote(page_id)}/children",
-                    headers={
-                        "Authorization": f"Bearer {notion_token}",
-                        "Notion-Version": "2022-06-28",
-                    },
-                )
-                if page_response.status_code == 200:
-                    page_content = page_response.json()
-                    for block in page_content.get('results', []):
-                        if block.get('type') == 'paragraph':
-                            text = block['paragraph']['rich_text']
-                            if text:
-                                relevant_info.append(''.join([t['text']['content'] for t in text]))
-                        elif block.get("type") == "file":
-                            file_data = block["file"]
-                            file_url = None
-                            if file_data["type"] == "external":
-                                file_url = file_data["external"]["url"]
-                            elif file_data["type"] == "file":
-                                file_url = file_data["file"]["url"]
-                            if file_url:
-                                relevant_info.append(f"File URL: {file_url}")
-                else:
-                    print(f"Error fetching page content: {page_response.status_code}, {page_response.json()}")
-
-        if not relevant_info:
-            return jsonify({'response': "I couldn't find any relevant information in the Acting Tips database."})
-
-        notion_summary = ' '.join(relevant_info)
-
-        # Use OpenAI client (new API)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": f"You are an acting mentor AI. Use the following information to help answer questions from the user: {notion_summary}"},
-                {"role": "user", "content": question}
-            ],
-            max_tokens=150
-        )
-        answer = response.choices[0].message.content
-        return jsonify({'response': answer})
+@app.route('/api/scenes/search', methods=['GET'])
+def search_scenes():
+    query = request.args.get('q', '')
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), 50))
+    except ValueError:
+        return jsonify({'error': 'Query parameter limit must be an integer'}), 400
+    if mirror is None:
+        return jsonify({'error': 'Scene search needs the Notion mirror (NOTION_MIRROR_PATH)'}), 503
+
+    try:
+        # Syncs write through to the mirror, so searching it sees the same scenes as /scene_analysis
+        scene_snapshot.ensure_fresh()
+        return jsonify({'results': mirror.search_scenes(query, limit)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/ready', methods=['GET'])
+def readiness():
+    status = {'ready': ready.is_set(), 'prewarm': prewarm_status}
+    return jsonify(status), 200 if ready.is_set() else 503
+
+@app.route('/health/notion', methods=['GET'])
+def notion_health():
+    # Circuit breaker state, and how old the snapshots served while it is open are
+    return jsonify({
+        'circuit': notion.breaker.metrics(),
+        'snapshots': {
+            'acting_tips': {'age': tips_snapshot.age()},
+            'scene_analysis': {'age': scene_snapshot.age()},
+        },
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        'notion_scheduler': notion.rate_limiter.metrics(),
+        'notion_circuit': notion.breaker.metrics(),
+        'context_packing': packing_metrics(),
+        'single_flight': single_flight.metrics(),
+        'retrieval': retrieval_engine.metrics(),
+        'caches': dict(tips_snapshot.metrics(), **scene_snapshot.metrics()),
+        'scene_text_cache': scene_text_cache.metrics(),
+    })
+
+@app.route('/webhooks/notion', methods=['POST'])
+def notion_webhook():
+    event = request.get_json(silent=True) or {}
+    if 'verification_token' in event:
+        # Sent once when the subscription is created; set it as NOTION_WEBHOOK_SECRET
+        print(f"🔑 Notion webhook verification token: {event['verification_token']}")
+        return jsonify({'message': 'Verification token received'})
+    if not NOTION_WEBHOOK_SECRET:
+        # Without the secret anyone could post events, so refuse them until it is configured
+        return jsonify({'error': 'NOTION_WEBHOOK_SECRET is not set'}), 503
+    if not verify_signature(request.get_data(), request.headers.get('X-Notion-Signature'), NOTION_WEBHOOK_SECRET):
+        return jsonify({'error': 'Invalid signature'}), 401
+    webhook_handler.dispatch(event)
+    return jsonify({'message': 'Event accepted'})
+
 @app.route('/upload', methods=['POST'])
 def upload():
     if 'file' not in request.files:
@@ -421,43 +474,38 @@ def upload():
         return jsonify({'message': 'No selected file'}), 400
 
     try:
-        file_path = os.path.join('/tmp', file.filename)
-        file.save(file_path)
-
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
+        # Read the upload straight from the request instead of round-tripping through /tmp
+        file_data = file.read()
 
         # Upload the file to AWS S3 and get the public URL
         file_url = upload_file_to_s3(file.filename, file_data)
         
         if not file_url:
             raise ValueError("Failed to upload file to S3")
+        # A re-upload under the same name replaces the object, so repoint its cache entry,
+        # then parse the PDF in the background while we create the Notion page
+        cache_key = source_key(file_url, s3_bucket_name)
+        scene_text_cache.set_source(cache_key, content_hash(file_data))
+        upload_executor.submit(extract_uploaded_scene, file.filename, cache_key, file_data)
 
         # Use Notion API to upload the file as an external file
-        response = requests.post(
-            f"https://api.notion.com/v1/pages",
-            headers={
-                "Authorization": f"Bearer {notion_token}",
-                "Content-Type": "application/json",
-                "Notion-Version": "2022-06-28",
-            },
-            json={
-                "parent": {"database_id": notion_database_scene_id},
-                "properties": {
-                    "Title": {"title": [{"text": {"content": file.filename}}]},
-                    "Upload Scene": {
-                        "files": [{
-                            "name": file.filename,
-                            "external": {"url": file_url}
-                        }]
-                    }
+        response = notion.create_page({
+            "parent": {"database_id": notion_database_scene_id},
+            "properties": {
+                "Title": {"title": [{"text": {"content": file.filename}}]},
+                "Upload Scene": {
+                    "files": [{
+                        "name": file.filename,
+                        "external": {"url": file_url}
+                    }]
                 }
             }
-        )
+        })
 
         notion_data = response.json()
         if response.status_code != 200:
             raise ValueError(f"Notion API error: {notion_data}")
+        scene_snapshot.add_page(notion_data)
 
         return jsonify({'message': f'File {file.filename} uploaded successfully to Notion', 'notion_data': notion_data})
 
@@ -466,17 +514,21 @@ def upload():
 
 def generate_final_feedback(questions, responses):
     try:
-        questions_and_answers = ""
-        for question, response_text in zip(questions, responses):
-            questions_and_answers += f"Q: {question}\nA: {response_text}\n"
+        system_prompt = "You are an acting mentor AI who gives actionable feedback to an actor based on their answers to a set of acting questions."
+        user_prompt = "Here are the questions and answers:\n{questions_and_answers}\nPlease provide final feedback for the actor."
+
+        # Keep as many Q&A pairs as fit in the token budget, in the order they were asked
+        pairs = [f"Q: {question}\nA: {response_text}\n" for question, response_text in zip(questions, responses)]
+        packed = pack_context(pairs, openai_model, system_prompt + user_prompt, MENTOR_MAX_TOKENS)
+        questions_and_answers = "".join(packed.chunks)
 
         response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+            model=openai_model,
             messages=[
-                {"role": "system", "content": "You are an acting mentor AI who gives actionable feedback to an actor based on their answers to a set of acting questions."},
-                {"role": "user", "content": f"Here are the questions and answers:\n{questions_and_answers}\nPlease provide final feedback for the actor."}
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt.format(questions_and_answers=questions_and_answers)}
             ],
-            max_tokens=150
+            max_tokens=MENTOR_MAX_TOKENS
         )
         feedback = response.choices[0].message.content
         return feedback
@@ -484,5 +536,6 @@ def generate_final_feedback(questions, responses):
         return f"An error occurred while generating feedback: {str(e)}"
 
 if __name__ == "__main__":
+    start_background_tasks()
     port = int(os.environ.get('PORT', 5000))
     app.run(host="0.0.0.0", port=port)
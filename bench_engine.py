@@ -0,0 +1,107 @@
+"""
+Benchmarks for the retrieval engine behind `/` and `/api/ask`: latency of a
+cold retrieval (index build), uncached and cached retrievals, and throughput
+with many concurrent questions.
+
+The tips snapshot is restored from the synthetic corpus in bench_retrieval.py,
+so no Notion or OpenAI calls are made.
+
+Usage: python bench_engine.py [--pages 30 100 300] [--chunks-per-page 20] [--threads 1 4 16]
+                             [--questions 200] [--index bm25 tfidf]
+"""
+import argparse
+import contextlib
+import io
+import random
+import statistics
+import threading
+import time
+
+import knowledge
+from bench_retrieval import QUESTIONS, VOCABULARY, synthetic_state
+from engine import RetrievalEngine
+from retrieval import BM25Index, TfidfIndex
+
+PROMPT = "You are an acting mentor AI. Use the following information to help answer questions from the user: {notion_summary}"
+
+
+def make_engine(pages, chunks_per_page, index_class, cache_size):
+    page_order, state = synthetic_state(pages, chunks_per_page)
+    snapshot = knowledge.TipsSnapshot(None, "bench-db", index=index_class())
+    snapshot.restore({"page_order": page_order, "pages": state}, time.time())
+    return RetrievalEngine(snapshot, "gpt-3.5-turbo", PROMPT, 150, cache_size=cache_size)
+
+
+def question_mix(count, distinct, seed=11):
+    """
+    `count` questions drawn from `distinct` different ones, like real traffic repeating popular questions.
+    """
+    rng = random.Random(seed)
+    pool = QUESTIONS + [f"How do I work on my {' '.join(rng.sample(VOCABULARY, 3))}?"
+                        for _ in range(max(0, distinct - len(QUESTIONS)))]
+    return [rng.choice(pool[:distinct]) for _ in range(count)]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    # pack_context logs every prompt; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def throughput(engine, questions, threads):
+    chunks = [questions[i::threads] for i in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(batch):
+        barrier.wait()
+        for question in batch:
+            engine.retrieve(question)
+
+    workers = [threading.Thread(target=worker, args=(batch,)) for batch in chunks]
+    for thread in workers:
+        thread.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in workers:
+            thread.join()
+    return len(questions) / (time.perf_counter() - start)
+
+
+def bench(pages, chunks_per_page, index_class, thread_counts, question_count):
+    print(f"{index_class.__name__}: {pages} pages x {chunks_per_page} chunks")
+    engine = make_engine(pages, chunks_per_page, index_class, cache_size=256)
+    _, cold = timed(engine.retrieve, QUESTIONS[0])
+    print(f"  cold (index build)   {cold:8.2f} ms")
+
+    uncached = [timed(engine.retrieve, question)[1] for question in QUESTIONS[1:]]
+    print(f"  uncached question    {statistics.median(uncached):8.2f} ms")
+    cached = [timed(engine.retrieve, question)[1] for question in QUESTIONS[1:]]
+    print(f"  cached question      {statistics.median(cached):8.2f} ms")
+
+    questions = question_mix(question_count, distinct=20)
+    for cache_size in (0, 256):
+        engine = make_engine(pages, chunks_per_page, index_class, cache_size)
+        timed(engine.retrieve, QUESTIONS[0])
+        rates = " ".join(f"{throughput(engine, questions, threads):>8.0f}/s" for threads in thread_counts)
+        label = "cache on " if cache_size else "cache off"
+        print(f"  {label} threads {' '.join(f'{t:>10}' for t in thread_counts)}")
+        print(f"  {'':9}         {rates}")
+    print(f"  engine metrics       {engine.metrics()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[30, 100, 300])
+    parser.add_argument("--chunks-per-page", type=int, default=20)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--index", choices=["bm25", "tfidf"], nargs="+", default=["bm25", "tfidf"])
+    args = parser.parse_args()
+
+    index_classes = {"bm25": BM25Index, "tfidf": TfidfIndex}
+    for kind in args.index:
+        for pages in args.pages:
+            bench(pages, args.chunks_per_page, index_classes[kind], args.threads, args.questions)
@@ -0,0 +1,295 @@
+"""
+Benchmarks for the Notion layer against a local Notion stand-in.
+
+The stand-in is a tiny threaded HTTP server that answers the endpoints the app
+uses (database query and schema, page retrieve and block children) after a fixed artificial delay,
+so wall times reflect request fan-out rather than real Notion latency.
+
+Usage: python bench_notion.py [--latency 0.05] [--pages 5 10 20 40] [--concurrency 1 4 8]
+                             [--tree-depth 3] [--tree-fanout 4] [--scenes 500] [--scene-columns 30]
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote
+
+import knowledge
+import notion_api
+
+
+class FakeNotion:
+    """
+    In-process stand-in for api.notion.com with a configurable number of tips pages.
+    """
+
+    def __init__(self, pages=10, latency=0.05, paragraphs=5, tree_depth=0, scenes=0, scene_columns=0):
+        self.pages = pages
+        self.latency = latency
+        self.paragraphs = paragraphs
+        # Blocks nest as toggles down to this depth, for block-tree walking benchmarks
+        self.tree_depth = tree_depth
+        self.database_id = "tips-db"
+        # Scene Analysis rows, each with `scene_columns` note properties the app never reads
+        self.scene_database_id = "scene-db"
+        self.scenes = scenes
+        self.scene_columns = scene_columns
+        self.bytes_sent = 0
+        # While set, every call answers 503 like a Notion outage
+        self.failing = False
+        self.versions = Counter()  # page_id -> number of edits, see edit()
+        self.deleted = set()
+        self.parents = {}  # page_id -> parent database ID, for pages moved with move()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0  # most requests being served at once
+        self.counts = Counter()  # "query" / "page" / "children" -> number of calls
+        self.calls = []  # (kind, page_size) of every call, in arrival order
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def edit(self, page_id):
+        with self._lock:
+            self.versions[page_id] += 1
+
+    def delete(self, page_id):
+        with self._lock:
+            self.deleted.add(page_id)
+
+    def move(self, page_id, database_id):
+        with self._lock:
+            self.parents[page_id] = database_id
+
+    def page(self, page_id):
+        database_id = self.scene_database_id if page_id.startswith("scene-") else self.database_id
+        return {
+            "object": "page",
+            "id": page_id,
+            "parent": {"type": "database_id", "database_id": self.parents.get(page_id, database_id)},
+            "last_edited_time": f"2024-01-01T00:{self.versions[page_id]:02d}:00.000Z",
+            "in_trash": page_id in self.deleted,
+            "properties": {},
+        }
+
+    def scene_schema(self):
+        schema = {"Title": {"id": "title", "type": "title"}, "Upload Scene": {"id": "upload", "type": "files"}}
+        for column in range(self.scene_columns):
+            schema[f"Notes {column}"] = {"id": f"notes{column}", "type": "rich_text"}
+        return schema
+
+    def scene_results(self, property_ids=None):
+        results = []
+        for i in range(self.scenes):
+            properties = {
+                "Title": {"id": "title", "type": "title", "title": [{"text": {"content": f"Scene {i}"}}]},
+                "Upload Scene": {"id": "upload", "type": "files", "files": [
+                    {"name": f"scene-{i}.pdf", "type": "external", "external": {"url": f"https://files/scene-{i}.pdf"}}]},
+            }
+            for column in range(self.scene_columns):
+                text = f"Rehearsal note {column} for scene {i}. " * 6
+                properties[f"Notes {column}"] = {"id": f"notes{column}", "type": "rich_text", "rich_text": [
+                    {"type": "text", "text": {"content": text, "link": None}, "plain_text": text, "href": None,
+                     "annotations": {"bold": False, "italic": False, "strikethrough": False,
+                                     "underline": False, "code": False, "color": "default"}}]}
+            if property_ids:
+                properties = {name: value for name, value in properties.items() if value["id"] in property_ids}
+            results.append({
+                "object": "page", "id": f"scene-{i}", "created_time": f"2024-01-01T00:00:{i % 60:02d}.000Z",
+                "last_edited_time": "2024-01-01T00:00:00.000Z",
+                "parent": {"type": "database_id", "database_id": self.scene_database_id}, "properties": properties,
+            })
+        return results
+
+    def page_results(self):
+        page_ids = [f"page-{i}" for i in range(self.pages)]
+        return [self.page(page_id) for page_id in page_ids
+                if page_id not in self.deleted and self.parents.get(page_id, self.database_id) == self.database_id]
+
+    def block_results(self, block_id):
+        depth = block_id.count(".")
+        nested = depth < self.tree_depth
+        block_type = "toggle" if nested else "paragraph"
+        version = self.versions[block_id.split(".")[0]]
+        suffix = f" v{version}" if version else ""
+        return [
+            {
+                "object": "block",
+                "id": f"{block_id}.{n}",
+                "type": block_type,
+                "has_children": nested,
+                block_type: {"rich_text": [{"text": {"content": f"{block_id} tip {n}{suffix}"},
+                                              "plain_text": f"{block_id} tip {n}{suffix}"}]},
+            }
+            for n in range(self.paragraphs)
+        ]
+
+    @staticmethod
+    def _page_of(results, page_size, cursor):
+        """
+        Slice `results` the way Notion paginates: `page_size` items after `cursor`.
+        """
+        start = int(cursor or 0)
+        end = start + int(page_size or 100)
+        has_more = end < len(results)
+        return {"object": "list", "results": results[start:end], "has_more": has_more,
+                "next_cursor": str(end) if has_more else None}
+
+    def route(self, method, path, body):
+        path, _, query = path.partition("?")
+        multi_params = parse_qs(query)
+        params = {key: values[0] for key, values in multi_params.items()}
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+        if method == "POST" and parts[0] == "databases" and parts[-1] == "query":
+            with self._lock:
+                self.counts["query"] += 1
+                self.calls.append(("query", body.get('page_size')))
+            if parts[1] == self.scene_database_id:
+                results = self.scene_results(multi_params.get("filter_properties"))
+            else:
+                results = self.page_results()
+            return self._page_of(results, body.get("page_size"), body.get("start_cursor"))
+        if method == "GET" and parts[0] == "databases" and len(parts) == 2:
+            with self._lock:
+                self.counts["schema"] += 1
+                self.calls.append(("schema", None))
+            return {"object": "database", "id": parts[1], "properties": self.scene_schema()}
+        if method == "GET" and parts[0] == "pages" and len(parts) == 2:
+            with self._lock:
+                self.counts["page"] += 1
+                self.calls.append(("page", None))
+            return self.page(parts[1])
+        if method == "GET" and parts[0] == "blocks" and parts[-1] == "children":
+            with self._lock:
+                self.counts["children"] += 1
+                self.calls.append(("children", params.get('page_size')))
+            return self._page_of(self.block_results(parts[1]), params.get("page_size"), params.get("start_cursor"))
+        return None
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _respond(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                with fake._lock:
+                    fake.requests += 1
+                    fake.in_flight += 1
+                    fake.peak_in_flight = max(fake.peak_in_flight, fake.in_flight)
+                time.sleep(fake.latency)
+                with fake._lock:
+                    fake.in_flight -= 1
+                if fake.failing:
+                    payload, status = {"object": "error", "status": 503, "code": "service_unavailable"}, 503
+                else:
+                    payload = fake.route(method, self.path, body)
+                    status = 200 if payload is not None else 404
+                data = json.dumps(payload if payload is not None else {"object": "error"}).encode()
+                with fake._lock:
+                    fake.bytes_sent += len(data)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def client(self, **kwargs):
+        # The stand-in has no rate limit, so don't let the real one skew wall times
+        kwargs.setdefault("rate_limiter", notion_api.RateLimiter(rate=1e6, burst=1000))
+        return notion_api.NotionClient("token", base_url=self.url, **kwargs)
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def bench_fanout(page_counts, concurrencies, latency):
+    print(f"Cold tips sync, {latency * 1000:.0f} ms per Notion call")
+    print(f"{'pages':>6} " + " ".join(f"{'c=' + str(c):>9}" for c in concurrencies))
+    for pages in page_counts:
+        row = []
+        with FakeNotion(pages=pages, latency=latency) as fake:
+            for concurrency in concurrencies:
+                snapshot = knowledge.TipsSnapshot(fake.client(), "tips-db", concurrency=concurrency)
+                start = time.perf_counter()
+                snapshot.sync()
+                row.append(time.perf_counter() - start)
+            assert fake.requests == len(concurrencies) * (pages + 1)
+        print(f"{pages:>6} " + " ".join(f"{t * 1000:>7.0f}ms" for t in row))
+
+
+def bench_block_tree(depth, fanout, concurrencies, latency):
+    blocks = sum(fanout ** level for level in range(1, depth + 2))
+    print(f"Block tree walk: depth {depth}, fanout {fanout} ({blocks} blocks), {latency * 1000:.0f} ms per Notion call")
+    with FakeNotion(pages=1, latency=latency, paragraphs=fanout, tree_depth=depth) as fake:
+        for concurrency in concurrencies:
+            before = fake.requests
+            start = time.perf_counter()
+            info = knowledge.walk_block_tree(fake.client(), "page-0", concurrency=concurrency,
+                                             max_depth=depth + 1, max_blocks=blocks)
+            elapsed = time.perf_counter() - start
+            assert len(info) == blocks
+            print(f"  c={concurrency:<3} {elapsed * 1000:>7.0f}ms  {fake.requests - before} calls")
+
+
+def bench_scene_projection(scenes, columns, latency):
+    decoder = "orjson" if notion_api.orjson is not None else "json"
+    print(f"Scene Analysis sync: {scenes} scenes with {columns} unused note properties, decoded with {decoder}")
+    with FakeNotion(pages=0, latency=latency, scenes=scenes, scene_columns=columns) as fake:
+        for label, properties in (("all properties", ()), ("projected", knowledge.SCENE_PROPERTIES)):
+            snapshot = knowledge.SceneSnapshot(fake.client(), fake.scene_database_id)
+            snapshot.properties = properties
+            before = fake.bytes_sent
+            start = time.perf_counter()
+            snapshot.sync()
+            elapsed = time.perf_counter() - start
+            sent = fake.bytes_sent - before
+
+            # Decode cost on its own, for the same payload the sync received
+            property_ids = snapshot._property_ids(notion_api.BACKGROUND)
+            body = json.dumps(fake._page_of(fake.scene_results(property_ids), 100, None)).encode()
+            rounds = 20
+            decode_start = time.perf_counter()
+            for _ in range(rounds):
+                notion_api.decode_json(body)
+            decode = (time.perf_counter() - decode_start) / rounds * (scenes / 100 or 1)
+            print(f"  {label:<15} {sent / 1024:>9.1f} KiB  sync {elapsed * 1000:>7.0f}ms  "
+                  f"decode {decode * 1000:>6.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 10, 20, 40])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--tree-depth", type=int, default=3)
+    parser.add_argument("--tree-fanout", type=int, default=4)
+    parser.add_argument("--scenes", type=int, default=500)
+    parser.add_argument("--scene-columns", type=int, default=30)
+    args = parser.parse_args()
+    bench_fanout(args.pages, args.concurrency, args.latency)
+    print()
+    bench_block_tree(args.tree_depth, args.tree_fanout, args.concurrency, args.latency)
+    print()
+    bench_scene_projection(args.scenes, args.scene_columns, args.latency)
@@ -0,0 +1,178 @@
+"""
+Benchmarks for PDF text extraction: in-memory parsing versus writing each
+download to a temp file first, throughput with many threads extracting at once,
+and page-parallel extraction of long scripts in a process pool.
+
+PDFs are generated locally (plain Helvetica text pages), so no downloads are made.
+
+Usage: python bench_pdf.py [--pages 1 10 50] [--files 40] [--threads 1 4 8]
+                           [--script-pages 120 240] [--processes 2 4]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pdf_text import extract_text_from_bytes, extraction_pool
+
+LINE = "INT. REHEARSAL ROOM - DAY. The actor breathes, finds the objective and plays the beat."
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages):
+    """
+    Build a PDF with one page per entry in `pages`, each a list of text lines.
+    """
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        content = b"BT /F1 11 Tf 14 TL 72 760 Td " + b" ".join(
+            b"(" + _escape(line).encode("latin-1") + b") Tj T*" for line in lines) + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(b"%d 0 R" % len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(kids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def sample_pdf(page_count, lines_per_page=40, tag=""):
+    return make_pdf([[f"{tag}p{page} l{line} {LINE}" for line in range(lines_per_page)]
+                     for page in range(page_count)])
+
+
+class FileServer:
+    """
+    Local HTTP server for PDF downloads: `routes` maps a path to (body, headers,
+    delay between chunks). Query strings are ignored, like a signed URL's.
+    """
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.hits = Counter()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                server.hits[path] += 1
+                body, headers, delay = server.routes[path]
+                self.send_response(200)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                for start in range(0, len(body), 4096):
+                    self.wfile.write(body[start:start + 4096])
+                    time.sleep(delay)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def extract_via_temp_file(data):
+    """
+    The old approach: write the download to disk and parse it from there.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(data)
+        path = f.name
+    try:
+        with open(path, "rb") as f:
+            return extract_text_from_bytes(f.read())
+    finally:
+        os.unlink(path)
+
+
+def run_threads(fn, items, threads):
+    chunks = [items[i::threads] for i in range(threads)]
+    workers = [threading.Thread(target=lambda batch=batch: [fn(item) for item in batch]) for batch in chunks]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def bench(page_count, files, thread_counts):
+    data = sample_pdf(page_count)
+    view = memoryview(bytearray(data))
+    print(f"{page_count}-page PDF ({len(data) / 1024:.0f} KiB), {files} files")
+    for label, fn in (("temp file", extract_via_temp_file), ("in memory", serial_extract),
+                      ("memoryview", lambda d: serial_extract(view))):
+        start = time.perf_counter()
+        for _ in range(files):
+            fn(data)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<11} {elapsed / files * 1000:8.1f} ms/file")
+    for threads in thread_counts:
+        elapsed = run_threads(serial_extract, [data] * files, threads)
+        print(f"  {threads:>2} threads  {files / elapsed:8.1f} files/s")
+
+
+def serial_extract(data):
+    return extract_text_from_bytes(data, processes=1)
+
+
+def bench_long_script(page_count, process_counts, runs=3):
+    """
+    A feature-length screenplay parsed in-process versus split across worker processes.
+    """
+    data = sample_pdf(page_count, lines_per_page=50)
+    print(f"{page_count}-page script ({len(data) / 1024:.0f} KiB, {os.cpu_count()} CPUs)")
+    start = time.perf_counter()
+    for _ in range(runs):
+        expected = serial_extract(data)
+    print(f"  in-process    {(time.perf_counter() - start) / runs * 1000:8.1f} ms")
+    for processes in process_counts:
+        # Spawning the workers is a one-off cost per web worker, so keep it out of the timing
+        list(extraction_pool(processes).map(abs, range(processes)))
+        start = time.perf_counter()
+        for _ in range(runs):
+            text = extract_text_from_bytes(data, processes=processes, min_pages=1)
+        elapsed = (time.perf_counter() - start) / runs
+        assert text == expected
+        print(f"  {processes:>2} processes  {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--script-pages", type=int, nargs="+", default=[120, 240])
+    parser.add_argument("--processes", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+    for pages in args.pages:
+        bench(pages, args.files, args.threads)
+    for pages in args.script_pages:
+        bench_long_script(pages, args.processes)
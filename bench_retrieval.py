@@ -0,0 +1,121 @@
+"""
+Benchmarks for tips retrieval: prompt size and latency of sending every tip
+versus only the top-k chunks for a question.
+
+A synthetic tips corpus is generated so the numbers don't depend on the live
+Notion workspace. Pass --openai to also time real chat completions for both
+prompt strategies (needs OPENAI_API_KEY).
+
+Usage: python bench_retrieval.py [--pages 30 100 300] [--chunks-per-page 20] [--top-k 8]
+                                [--index bm25 tfidf] [--openai]
+"""
+import argparse
+import os
+import random
+import time
+
+from retrieval import BM25Index, TfidfIndex, count_tokens
+
+VOCABULARY = """
+voice breath diaphragm resonance projection posture stance gesture movement blocking objective
+obstacle tactic beat subtext motivation backstory status stakes relationship listening reacting
+audition callback monologue cold read sides slate eye line camera close-up stage presence
+improvisation emotional memory sense memory substitution given circumstances super objective
+rehearsal script analysis memorisation lines cue pause rhythm tempo pitch accent dialect
+nerves confidence warm up relaxation tension release focus concentration imagination truth
+""".split()
+
+QUESTIONS = [
+    "How do I calm my nerves before an audition?",
+    "What warm up should I do for my voice and breath?",
+    "How can I find my character's objective and tactics in a scene?",
+    "Any tips for memorising lines quickly?",
+    "How do I play high status versus low status?",
+]
+
+
+def synthetic_state(pages, chunks_per_page, seed=7):
+    rng = random.Random(seed)
+    page_order = [f"page-{i}" for i in range(pages)]
+    state = {
+        page_id: {
+            "last_edited_time": "2024-01-01T00:00:00.000Z",
+            "info": [" ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(25, 60))) + "."
+                     for _ in range(chunks_per_page)],
+        }
+        for page_id in page_order
+    }
+    return page_order, state
+
+
+def system_prompt(chunks):
+    return f"You are an acting mentor AI. Use the following information to help answer questions from the user: {' '.join(chunks)}"
+
+
+def time_completion(client, prompt, question):
+    start = time.perf_counter()
+    client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[{"role": "system", "content": prompt}, {"role": "user", "content": question}],
+        max_tokens=150,
+    )
+    return time.perf_counter() - start
+
+
+def bench(pages, chunks_per_page, top_k, index_class=BM25Index, openai_client=None):
+    page_order, state = synthetic_state(pages, chunks_per_page)
+    all_chunks = [chunk for page_id in page_order for chunk in state[page_id]["info"]]
+
+    index = index_class()
+    start = time.perf_counter()
+    index.sync(page_order, state)
+    build = time.perf_counter() - start
+
+    # One page edited in Notion: BM25 re-indexes that page, TF-IDF rebuilds
+    edited = dict(state)
+    edited[page_order[0]] = dict(state[page_order[0]], info=list(state[page_order[0]]["info"]))
+    start = time.perf_counter()
+    reindexed = index.sync(page_order, edited)
+    update = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = [index.search(question, top_k) for question in QUESTIONS]
+    query = (time.perf_counter() - start) / len(QUESTIONS)
+
+    full_tokens = count_tokens(system_prompt(all_chunks))
+    top_k_tokens = sum(count_tokens(system_prompt(chunks)) for chunks in results) / len(results)
+
+    print(f"{index_class.__name__}: {pages} pages x {chunks_per_page} chunks ({len(all_chunks)} chunks)")
+    print(f"  index build        {build * 1000:8.1f} ms")
+    print(f"  one page edited    {update * 1000:8.1f} ms ({reindexed} pages re-indexed)")
+    print(f"  query              {query * 1000:8.2f} ms")
+    print(f"  prompt tokens      {full_tokens:8d} all tips -> {top_k_tokens:.0f} top-{top_k}")
+
+    if openai_client is not None:
+        question = QUESTIONS[0]
+        for label, chunks in (("all tips", all_chunks), (f"top-{top_k}", index.search(question, top_k))):
+            try:
+                elapsed = time_completion(openai_client, system_prompt(chunks), question)
+                print(f"  completion ({label:>8}) {elapsed * 1000:8.0f} ms")
+            except Exception as e:
+                print(f"  completion ({label:>8}) failed: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[30, 100, 300])
+    parser.add_argument("--chunks-per-page", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--index", choices=["bm25", "tfidf"], nargs="+", default=["bm25", "tfidf"])
+    parser.add_argument("--openai", action="store_true")
+    args = parser.parse_args()
+
+    openai_client = None
+    if args.openai:
+        from openai import OpenAI
+        openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    index_classes = {"bm25": BM25Index, "tfidf": TfidfIndex}
+    for kind in args.index:
+        for pages in args.pages:
+            bench(pages, args.chunks_per_page, args.top_k, index_classes[kind], openai_client)
@@ -0,0 +1,121 @@
+"""
+Retrieval engine behind the mentor endpoints: a question goes in, the packed
+tips context and where each chunk came from come out.
+
+Both `/` and `/api/ask` go through `RetrievalEngine.retrieve()`, so caching,
+request coalescing and timing live here rather than in the routes.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from knowledge import TIPS_TOP_K, single_flight
+from retrieval import pack_context, tokenize
+
+# Ranked results remembered per tips snapshot state; 0 disables the cache
+RETRIEVAL_CACHE_SIZE = int(os.getenv('RETRIEVAL_CACHE_SIZE', 256))
+
+# `chunks` is what goes into the prompt and `sources` the matching Hits, in the same order
+Retrieval = namedtuple('Retrieval', 'question chunks sources packed_tokens dropped cached timings')
+
+
+def provenance(retrieval):
+    """
+    JSON-friendly list of the tips chunks a prompt was built from.
+    """
+    return [{"page_id": hit.page_id, "position": hit.position, "score": round(hit.score, 4)}
+            for hit in retrieval.sources]
+
+
+class RetrievalEngine:
+    """
+    Ranks Acting Tips chunks for a question and packs them into the prompt budget.
+
+    Ranked hits are cached per question (by its search terms) until the tips
+    snapshot changes, and concurrent misses for the same terms share one
+    search. Packing runs on every call because it depends on the exact
+    question text.
+    """
+
+    def __init__(self, tips_snapshot, model, prompt_template, max_tokens, top_k=TIPS_TOP_K,
+                 cache_size=RETRIEVAL_CACHE_SIZE):
+        self.tips_snapshot = tips_snapshot
+        self.model = model
+        self.prompt_template = prompt_template
+        self.max_tokens = max_tokens
+        self.top_k = top_k
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # search terms -> (tips pages the hits came from, hits)
+        self._lock = threading.Lock()
+        self._stats = {"retrievals": 0, "cache_hits": 0, "sync_ms": 0.0, "search_ms": 0.0, "pack_ms": 0.0}
+
+    def _cached_hits(self, key, pages):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or entry[0] is not pages:
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _remember(self, key, pages, hits):
+        if not self.cache_size:
+            return
+        with self._lock:
+            self._cache[key] = (pages, hits)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def ranked(self, question):
+        """
+        Return (hits, cached) for `question`, searching only on a cache miss.
+        """
+        key = tuple(sorted(tokenize(question)))
+        pages = self.tips_snapshot.export()["pages"]
+        hits = self._cached_hits(key, pages)
+        if hits is not None:
+            return hits, True
+        hits = single_flight.do((id(self), "retrieve", key), self.tips_snapshot.search_hits, question, self.top_k,
+                                check_fresh=False)
+        self._remember(key, pages, hits)
+        return hits, False
+
+    def retrieve(self, question):
+        timings = {}
+        start = time.perf_counter()
+        self.tips_snapshot.ensure_fresh()
+        timings["sync_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        hits, cached = self.ranked(question)
+        timings["search_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        packed = pack_context([hit.text for hit in hits], self.model, self.prompt_template + question, self.max_tokens)
+        # Packing keeps the ranked order and only skips chunks, so walk both lists together
+        remaining = iter(hits)
+        sources = [next(hit for hit in remaining if hit.text == chunk) for chunk in packed.chunks]
+        timings["pack_ms"] = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._stats["retrievals"] += 1
+            self._stats["cache_hits"] += cached
+            for name, elapsed in timings.items():
+                self._stats[name] += elapsed
+        return Retrieval(question, packed.chunks, sources, packed.packed_tokens, packed.dropped, cached, timings)
+
+    def system_prompt(self, retrieval):
+        return self.prompt_template.format(notion_summary=" ".join(retrieval.chunks))
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            cached_questions = len(self._cache)
+        retrievals = stats["retrievals"] or 1
+        return {
+            "retrievals": stats["retrievals"],
+            "cache_hits": stats["cache_hits"],
+            "cached_questions": cached_questions,
+            **{f"avg_{name}": round(stats[name] / retrievals, 3) for name in ("sync_ms", "search_ms", "pack_ms")},
+        }
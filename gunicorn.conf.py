@@ -0,0 +1,8 @@
+# Gunicorn settings, used when the app is served with `gunicorn app:app`
+
+
+def post_fork(server, worker):
+    # Importing app starts no threads, so with --preload the master forks clean; each
+    # worker starts its own sync worker and prewarm once it is running
+    import app
+    app.start_background_tasks()
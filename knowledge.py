@@ -0,0 +1,866 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+import httpx
+
+from notion_api import BACKGROUND, INTERACTIVE, normalize_id
+from pdf_text import chunk_text, download_pdf, extract_text_from_bytes
+from retrieval import Hit, make_index
+
+
+# Per-resource TTLs. Past the soft TTL a read is served from the stale copy while
+# a background sync runs; past the hard TTL the read waits for a fresh sync.
+TIPS_SOFT_TTL = float(os.getenv('TIPS_SOFT_TTL', os.getenv('TIPS_SYNC_INTERVAL', 60)))
+TIPS_HARD_TTL = float(os.getenv('TIPS_HARD_TTL', 600))
+SCENE_SOFT_TTL = float(os.getenv('SCENE_SOFT_TTL', os.getenv('SCENE_SYNC_INTERVAL', 60)))
+SCENE_HARD_TTL = float(os.getenv('SCENE_HARD_TTL', 600))
+# The latest scene is read right after uploads, so it revalidates sooner than the scene list
+LATEST_SCENE_SOFT_TTL = float(os.getenv('LATEST_SCENE_SOFT_TTL', 15))
+LATEST_SCENE_HARD_TTL = float(os.getenv('LATEST_SCENE_HARD_TTL', 120))
+# Scene Analysis properties the app reads; no others are fetched
+SCENE_PROPERTIES = ("Title", "Upload Scene")
+# Number of tips chunks sent to the model for each question
+TIPS_TOP_K = int(os.getenv('TIPS_TOP_K', 8))
+# How often the optional background worker refreshes every snapshot
+NOTION_SYNC_INTERVAL = float(os.getenv('NOTION_SYNC_INTERVAL', 60))
+# Maximum number of block-children requests in flight at once during a sync
+NOTION_FETCH_CONCURRENCY = int(os.getenv('NOTION_FETCH_CONCURRENCY', 4))
+
+
+def fetch_concurrently(fetch, items, max_workers=NOTION_FETCH_CONCURRENCY):
+    """
+    Call `fetch` on every item using at most `max_workers` threads.
+    Results come back in the same order as `items`.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [fetch(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(fetch, items))
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one in-flight call.
+
+    The first caller for a key runs the function; callers that arrive while it
+    is running wait and receive the same result (or exception). Once the call
+    finishes the key is forgotten, so the next miss starts a fresh call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> {"done": Event, "result": ..., "error": ...}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn(*args, **kwargs)
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+    def metrics(self):
+        with self._lock:
+            return {"in_flight": len(self._calls), "executions": self.executions, "shared": self.shared}
+
+
+# Shared by every Notion-backed cache in the process, keyed by (owning instance, resource)
+single_flight = SingleFlight()
+
+
+def rich_text_content(rich_text):
+    return "".join(t.get("plain_text") or t.get("text", {}).get("content", "") for t in rich_text)
+
+
+def block_file_url(block_value):
+    if block_value.get("type") == "external":
+        return block_value["external"]["url"]
+    if block_value.get("type") == "file":
+        return block_value["file"]["url"]
+    return None
+
+
+# Prefixes that keep the structure of a block visible without spending many tokens
+BLOCK_PREFIXES = {
+    "heading_1": "# ",
+    "heading_2": "## ",
+    "heading_3": "### ",
+    "bulleted_list_item": "- ",
+    "numbered_list_item": "- ",
+    "quote": "> ",
+}
+
+
+def block_text(block):
+    """
+    Render a single Notion block as compact text, or None if it carries no text.
+    """
+    block_type = block.get("type")
+    value = block.get(block_type) or {}
+    if block_type in ("file", "pdf"):
+        file_url = block_file_url(value)
+        return f"File URL: {file_url}" if file_url else None
+    if block_type == "child_page":
+        return f"# {value['title']}" if value.get("title") else None
+    if block_type == "table_row":
+        cells = [rich_text_content(cell) for cell in value.get("cells", [])]
+        return " | ".join(cells) if any(cells) else None
+
+    text = rich_text_content(value.get("rich_text", []))
+    if not text:
+        return None
+    if block_type == "to_do":
+        return f"[{'x' if value.get('checked') else ' '}] {text}"
+    if block_type == "callout":
+        emoji = (value.get("icon") or {}).get("emoji")
+        return f"{emoji} {text}" if emoji else text
+    return BLOCK_PREFIXES.get(block_type, "") + text
+
+
+# Limits for walking nested blocks of a single tips page
+NOTION_BLOCK_MAX_DEPTH = int(os.getenv('NOTION_BLOCK_MAX_DEPTH', 5))
+NOTION_BLOCK_MAX_BLOCKS = int(os.getenv('NOTION_BLOCK_MAX_BLOCKS', 1000))
+
+# Children of these blocks live behind a different endpoint or aren't tips content
+UNEXPANDED_BLOCK_TYPES = {"child_database", "unsupported"}
+
+
+def walk_block_tree(notion, page_id, priority=INTERACTIVE, max_depth=NOTION_BLOCK_MAX_DEPTH,
+                    max_blocks=NOTION_BLOCK_MAX_BLOCKS, concurrency=NOTION_FETCH_CONCURRENCY, expand_file=None,
+                    limiter=None):
+    """
+    Fetch the full block tree under `page_id` and return its text snippets in document order.
+
+    The tree is expanded one level at a time, with every `has_children` block on a
+    level fetched concurrently. Expansion stops below `max_depth` levels or once
+    `max_blocks` blocks have been fetched. If given, `expand_file(block)` returns
+    extra snippets (e.g. PDF text) to insert after each file or pdf block.
+
+    At most `concurrency` children requests are in flight at once. A sync walking
+    several pages in parallel passes one shared `limiter` (a semaphore) so the
+    bound holds across all of them.
+    """
+    limiter = limiter or threading.BoundedSemaphore(max(1, concurrency))
+
+    def fetch(block_id, limit):
+        with limiter:
+            return list(notion.iter_block_children(block_id, limit=limit, priority=priority))
+
+    children = {page_id: fetch(page_id, max_blocks)}
+    fetched = len(children[page_id])
+    level = children[page_id]
+    depth = 1
+    while level and depth < max_depth and fetched < max_blocks:
+        parents = [
+            block["id"] for block in level
+            if block.get("has_children") and block.get("type") not in UNEXPANDED_BLOCK_TYPES
+        ]
+        next_level = []
+        remaining = max_blocks - fetched
+        fetch_level = partial(fetch, limit=remaining)
+        for block_id, blocks in zip(parents, fetch_concurrently(fetch_level, parents, concurrency)):
+            blocks = blocks[:max(0, max_blocks - fetched)]
+            children[block_id] = blocks
+            fetched += len(blocks)
+            next_level.extend(blocks)
+        level = next_level
+        depth += 1
+
+    relevant_info = []
+    stack = list(reversed(children[page_id]))
+    while stack:
+        block = stack.pop()
+        text = block_text(block)
+        if text:
+            relevant_info.append(text)
+        if expand_file is not None and block.get("type") in ("file", "pdf"):
+            relevant_info.extend(expand_file(block))
+        stack.extend(reversed(children.get(block.get("id"), [])))
+    return relevant_info
+
+
+# Maximum characters per chunk of PDF text added to the tips index
+PDF_CHUNK_CHARS = int(os.getenv('PDF_CHUNK_CHARS', 1200))
+
+
+def is_pdf_block(block):
+    block_type = block.get("type")
+    if block_type == "pdf":
+        return True
+    value = block.get(block_type) or {}
+    file_url = block_file_url(value) or ""
+    name = value.get("name") or file_url.split("?", 1)[0]
+    return name.lower().endswith(".pdf")
+
+
+class PdfIngestor:
+    """
+    Turns PDFs attached to tips pages into text chunks for the retrieval index.
+
+    A block is downloaded once per version (`last_edited_time`). The extracted
+    text is cached by the SHA-256 of the file contents, so the same handout
+    attached twice, or re-uploaded unchanged, is only parsed once. With a
+    MirrorStore both caches survive restarts.
+    """
+
+    def __init__(self, store=None, chunk_chars=PDF_CHUNK_CHARS):
+        self.store = store
+        self.chunk_chars = chunk_chars
+        self._lock = threading.Lock()
+        self._block_hashes = {}  # (block_id, last_edited_time) -> content hash
+        self._texts = {}  # content hash -> extracted text
+
+    def _cached_hash(self, key):
+        with self._lock:
+            content_hash = self._block_hashes.get(key)
+        if content_hash is None and self.store is not None:
+            content_hash = self.store.file_hash(*key)
+        return content_hash
+
+    def _cached_text(self, content_hash):
+        with self._lock:
+            text = self._texts.get(content_hash)
+        if text is None and self.store is not None:
+            text = self.store.pdf_text(content_hash)
+        return text
+
+    def _remember(self, key, content_hash, text):
+        with self._lock:
+            self._block_hashes[key] = content_hash
+            self._texts[content_hash] = text
+        if self.store is not None:
+            self.store.save_pdf_text(content_hash, text)
+            self.store.save_file_hash(key[0], key[1], content_hash)
+
+    def text_for_block(self, block):
+        """
+        Return the extracted text of a PDF file block, or None if it isn't a readable PDF.
+        """
+        if not is_pdf_block(block):
+            return None
+        key = (block.get("id"), block.get("last_edited_time"))
+        return single_flight.do((id(self), "pdf") + key, self._text_for_block, block, key)
+
+    def _text_for_block(self, block, key):
+        content_hash = self._cached_hash(key)
+        text = self._cached_text(content_hash) if content_hash else None
+        if text is not None:
+            return text
+
+        file_url = block_file_url(block.get(block.get("type")) or {})
+        try:
+            data = download_pdf(file_url)
+            content_hash = hashlib.sha256(data).hexdigest()
+            text = self._cached_text(content_hash)
+            if text is None:
+                text = extract_text_from_bytes(data)
+        except Exception as e:
+            print(f"Error ingesting PDF from block {key[0]}: {e}")
+            return None
+        self._remember(key, content_hash, text)
+        return text
+
+    def export(self):
+        with self._lock:
+            return {
+                "files": [[block_id, edited, content_hash] for (block_id, edited), content_hash in self._block_hashes.items()],
+                "texts": dict(self._texts),
+            }
+
+    def restore(self, state):
+        texts = state.get("texts", {})
+        for block_id, edited, content_hash in state.get("files", []):
+            if content_hash in texts:
+                self._remember((block_id, edited), content_hash, texts[content_hash])
+
+    def chunks_for_block(self, block):
+        text = self.text_for_block(block)
+        if not text:
+            return []
+        value = block.get(block.get("type")) or {}
+        source = value.get("name") or rich_text_content(value.get("caption", [])) or "attached PDF"
+        return [f"From {source}: {chunk}" for chunk in chunk_text(text, self.chunk_chars)]
+
+
+class TtlPolicy:
+    """
+    Soft and hard TTLs for one Notion-backed resource, plus counts of how its reads were served.
+    """
+
+    def __init__(self, name, soft_ttl, hard_ttl):
+        self.name = name
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = max(hard_ttl, soft_ttl)
+        self._lock = threading.Lock()
+        self._reads = {"fresh": 0, "stale": 0, "blocked": 0, "fallback": 0}
+
+    def record(self, outcome):
+        with self._lock:
+            self._reads[outcome] += 1
+
+    def metrics(self, age):
+        with self._lock:
+            reads = dict(self._reads)
+        return {
+            "soft_ttl": self.soft_ttl,
+            "hard_ttl": self.hard_ttl,
+            "age": round(age, 1) if age is not None else None,
+            "reads": reads,
+        }
+
+
+class NotionSnapshot:
+    """
+    Base class for process-wide, in-memory copies of a Notion database.
+
+    Subclasses implement `_refresh(priority)`, which runs under the snapshot
+    lock and swaps in new state. Readers call `ensure_fresh()` first, which
+    follows stale-while-revalidate: past the soft TTL the stale state is
+    returned at once and a background sync is started, and only past the hard
+    TTL (or before the first sync) does the reader wait on Notion. If that
+    sync fails, readers keep getting the last-known-good state. Once a
+    SyncWorker owns the snapshot (`refresh_on_read = False`) readers only wait
+    for the first sync.
+
+    With a MirrorStore, state is also written to SQLite after every sync and
+    read back when another process has synced more recently than we have.
+    Single-page edits (webhooks, uploads) are applied on top of the mirrored
+    state and recorded as edits, so they reach other processes without
+    counting as a sync.
+    """
+
+    store_key = None
+
+    def __init__(self, notion, database_id, policy, store=None):
+        self.notion = notion
+        self.database_id = database_id
+        self.policy = policy
+        self.store = store
+        self.refresh_on_read = True
+        self._lock = threading.Lock()
+        self._synced_at = None
+        self._edited_at = None  # the last mirrored single-page edit our state includes
+        self._revalidating = threading.Event()
+
+    def _refresh(self, priority):
+        raise NotImplementedError
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _save(self, synced_at=None, edited_at=None):
+        raise NotImplementedError
+
+    def _apply(self, state):
+        raise NotImplementedError
+
+    def export(self):
+        """
+        Return the snapshot state as JSON-serialisable data.
+        """
+        raise NotImplementedError
+
+    def _older_than(self, synced_at):
+        """
+        True if our state is older than state synced at wall-clock time `synced_at`.
+        """
+        age = max(0.0, time.time() - synced_at)
+        return self._synced_at is None or age < time.monotonic() - self._synced_at
+
+    def _adopt_sync_time(self, synced_at):
+        self._synced_at = time.monotonic() - max(0.0, time.time() - synced_at)
+
+    def synced_at(self):
+        """
+        Wall-clock time of the last sync, or None if we never synced.
+        """
+        if self._synced_at is None:
+            return None
+        return time.time() - (time.monotonic() - self._synced_at)
+
+    def _store_is_newer(self):
+        synced_at = self.store.synced_at(self.store_key)
+        if synced_at is not None and self._older_than(synced_at):
+            return True
+        edited_at = self.store.edited_at(self.store_key)
+        return edited_at is not None and edited_at != self._edited_at
+
+    def _load_from_store(self):
+        """
+        Adopt the mirrored state if it is newer than ours, e.g. written by another worker.
+        Runs under the snapshot lock.
+        """
+        if self.store is None or not self._store_is_newer():
+            return
+        synced_at = self.store.synced_at(self.store_key)
+        self._load()
+        self._edited_at = self.store.edited_at(self.store_key)
+        if synced_at is not None and self._older_than(synced_at):
+            self._adopt_sync_time(synced_at)
+
+    def _save_edit(self):
+        """
+        Write a single-page edit to the mirror without moving its sync time. Runs under the snapshot lock.
+        """
+        if self.store is not None:
+            self._edited_at = time.time()
+            self._save(edited_at=self._edited_at)
+
+    def restore(self, state, synced_at):
+        """
+        Adopt exported state (e.g. from a snapshot file) if it is newer than ours.
+        Returns True if it was adopted.
+        """
+        with self._lock:
+            if not self._older_than(synced_at):
+                return False
+            self._apply(state)
+            if self.store is not None:
+                self._save(synced_at)
+            self._adopt_sync_time(synced_at)
+            return True
+
+    def sync(self, force=True, priority=BACKGROUND, ttl=None):
+        """
+        Bring the snapshot up to date with Notion. Returns the number of items refetched.
+        Unless `force` is set, nothing is fetched if the state is younger than `ttl` (the soft TTL).
+        """
+        with self._lock:
+            self._load_from_store()
+            if not force and not self.is_stale(ttl):
+                # Another thread or process synced while we were waiting
+                return 0
+            refetched = self._refresh(priority)
+            self._synced_at = time.monotonic()
+            return refetched
+
+    def age(self):
+        """
+        Seconds since the last sync, or None if we never synced.
+        """
+        if self._synced_at is None:
+            return None
+        return time.monotonic() - self._synced_at
+
+    def is_stale(self, ttl=None):
+        if self._synced_at is None:
+            return True
+        if not self.refresh_on_read:
+            return False
+        return self.age() >= (self.policy.soft_ttl if ttl is None else ttl)
+
+    def has_page(self, page_id):
+        raise NotImplementedError
+
+    def refresh_page(self, page_id, priority=BACKGROUND):
+        """
+        Refetch a single page after Notion told us it changed. Returns False if it was dropped instead:
+        the page is gone, in the trash or no longer in this database.
+        """
+        page = self.notion.retrieve_page(page_id, priority=priority, properties=self._property_ids(priority))
+        if (page is None or page.get('in_trash') or page.get('archived')
+                or normalize_id((page.get('parent') or {}).get('database_id')) != normalize_id(self.database_id)):
+            self.remove_page(page_id)
+            return False
+        return self._refresh_page(page, priority)
+
+    def _refresh_page(self, page, priority):
+        raise NotImplementedError
+
+    def _property_ids(self, priority):
+        """
+        IDs of the page properties to fetch, or None for all of them.
+        """
+        return None
+
+    def remove_page(self, page_id):
+        raise NotImplementedError
+
+    def ensure_fresh(self, policy=None):
+        """
+        Make the snapshot fit to read under `policy` (the snapshot's own TTLs by default).
+        """
+        policy = policy or self.policy
+        if self.store is not None and not self._lock.locked():
+            # Pick up changes another worker wrote to the mirror, e.g. from a webhook
+            if self._store_is_newer():
+                with self._lock:
+                    self._load_from_store()
+        if self.is_stale(policy.hard_ttl):
+            # A user is waiting on this sync, so it jumps ahead of background work.
+            # Concurrent cache misses share one in-flight sync instead of queueing for their own.
+            policy.record("blocked")
+            try:
+                single_flight.do((id(self), "database", self.database_id), self.sync, force=False,
+                                 priority=INTERACTIVE, ttl=policy.soft_ttl)
+            except (ValueError, httpx.HTTPError) as e:
+                if self._synced_at is None:
+                    raise
+                # Notion is failing or the circuit is open: keep serving the last-known-good state
+                policy.record("fallback")
+                print(f"⚠️ Serving last-known-good {policy.name} ({self.age():.0f}s old): {e}")
+        elif self.is_stale(policy.soft_ttl):
+            policy.record("stale")
+            self.revalidate(policy.soft_ttl)
+        else:
+            policy.record("fresh")
+
+    def revalidate(self, ttl=None):
+        """
+        Start a background sync unless one is already running. Returns False if one was.
+        """
+        if self._revalidating.is_set():
+            return False
+        self._revalidating.set()
+        threading.Thread(target=self._run_revalidate, args=(ttl,), name=f"revalidate-{self.store_key}",
+                         daemon=True).start()
+        return True
+
+    def _run_revalidate(self, ttl):
+        try:
+            # Shares the in-flight sync with any reader that hit the hard TTL meanwhile
+            single_flight.do((id(self), "database", self.database_id), self.sync, force=False,
+                             priority=BACKGROUND, ttl=ttl)
+        except Exception as e:
+            print(f"⚠️ Background revalidation of {type(self).__name__} failed: {e}")
+        finally:
+            self._revalidating.clear()
+
+    def metrics(self):
+        return {self.policy.name: self.policy.metrics(self.age())}
+
+
+class TipsSnapshot(NotionSnapshot):
+    """
+    In-memory copy of the Acting Tips database.
+
+    A sync queries the database once and only refetches the children of pages
+    whose `last_edited_time` changed since the previous sync, so a warm
+    snapshot costs a single Notion call instead of 1+N.
+    """
+
+    store_key = "tips"
+
+    def __init__(self, notion, database_id, policy=None,
+                 concurrency=NOTION_FETCH_CONCURRENCY, store=None, index=None, pdf_ingestor=None):
+        super().__init__(notion, database_id, policy or TtlPolicy("acting_tips", TIPS_SOFT_TTL, TIPS_HARD_TTL), store)
+        self.concurrency = concurrency
+        self.pdf_ingestor = pdf_ingestor
+        # (page_order, {page_id: {"last_edited_time": ..., "info": [...]}}), swapped atomically
+        self._state = ([], {})
+        self._index = index if index is not None else make_index()
+        self._index_lock = threading.Lock()
+
+    def _load(self):
+        self._state = self._reuse_unchanged(*self.store.load_tips())
+
+    def _save(self, synced_at=None, edited_at=None):
+        page_order, pages = self._state
+        self.store.save_tips(page_order, pages, page_order, synced_at, edited_at)
+
+    def export(self):
+        page_order, pages = self._state
+        return {"page_order": page_order, "pages": pages}
+
+    def _apply(self, state):
+        self._state = self._reuse_unchanged(state["page_order"], state["pages"])
+
+    def _reuse_unchanged(self, page_order, pages):
+        """
+        Keep our own entries for pages whose content is the same in a state loaded from the
+        mirror or a snapshot file, so the retrieval index and the engine cache (which compare
+        by identity) only see the pages that really changed. Returns the state to adopt.
+        """
+        old_order, old_pages = self._state
+        pages = {page_id: old_pages[page_id] if old_pages.get(page_id) == page else page
+                 for page_id, page in pages.items()}
+        if page_order == old_order and len(pages) == len(old_pages) and all(
+                page is old_pages.get(page_id) for page_id, page in pages.items()):
+            return old_order, old_pages
+        return page_order, pages
+
+    def export_index(self):
+        """
+        Return the prebuilt retrieval index as a record, if the index type supports it.
+        """
+        with self._index_lock:
+            return self._index.to_record() if hasattr(self._index, "to_record") else None
+
+    def restore_index(self, record):
+        with self._index_lock:
+            if hasattr(self._index, "load_record"):
+                self._index.load_record(record)
+
+    def _query_pages(self, priority):
+        return self.notion.iter_database(self.database_id, priority=priority)
+
+    def _fetch_page_info(self, page_id, priority, limiter=None):
+        return single_flight.do((id(self), "page", page_id), self._walk_page, page_id, priority, limiter)
+
+    def _walk_page(self, page_id, priority, limiter=None):
+        try:
+            expand_file = self.pdf_ingestor.chunks_for_block if self.pdf_ingestor else None
+            return walk_block_tree(self.notion, page_id, priority=priority, concurrency=self.concurrency,
+                                   expand_file=expand_file, limiter=limiter)
+        except (ValueError, httpx.HTTPError) as e:
+            print(f"Error fetching page content for {page_id}: {e}")
+            return None
+
+    def _refresh(self, priority):
+        _, cached_pages = self._state
+        # One bound on children requests for the whole sync, however many pages are walked at once
+        limiter = threading.BoundedSemaphore(max(1, self.concurrency))
+        fetch = partial(self._fetch_page_info, priority=priority, limiter=limiter)
+
+        # Changed pages start walking as soon as their page of query results arrives,
+        # while the next page of results is still being fetched
+        pages = []
+        walks = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency), thread_name_prefix="tips-sync") as executor:
+            for page in self._query_pages(priority):
+                page_id = page.get('id')
+                if not page_id:
+                    continue
+                pages.append(page)
+                cached = cached_pages.get(page_id)
+                if cached is None or cached["last_edited_time"] != page.get('last_edited_time'):
+                    walks[page_id] = executor.submit(fetch, page_id)
+            fetched = {page_id: walk.result() for page_id, walk in walks.items()}
+        changed = list(fetched)
+
+        page_order = []
+        fresh_pages = {}
+        for page in pages:
+            page_id = page['id']
+            cached = cached_pages.get(page_id)
+            if page_id in fetched:
+                info = fetched[page_id]
+                edited = page.get('last_edited_time')
+                if info is None:
+                    # Keep the old content (if any) and retry on the next sync
+                    if cached is None:
+                        continue
+                    edited = None
+                    info = cached["info"]
+                cached = {"last_edited_time": edited, "info": info}
+            page_order.append(page_id)
+            fresh_pages[page_id] = cached
+
+        self._state = (page_order, fresh_pages)
+        if self.store is not None:
+            self.store.save_tips(page_order, fresh_pages, changed)
+        return len(changed)
+
+    def has_page(self, page_id):
+        return page_id in self._state[1]
+
+    def _refresh_page(self, page, priority):
+        page_id = page['id']
+        info = self._fetch_page_info(page_id, priority)
+        if info is None:
+            return False
+        with self._lock:
+            # Apply the edit to the newest mirrored state, not a copy another worker has since replaced
+            self._load_from_store()
+            page_order, pages = self._state
+            pages = dict(pages)
+            pages[page_id] = {"last_edited_time": page.get('last_edited_time'), "info": info}
+            if page_id not in page_order:
+                # New pages go last until the next full sync puts them in database order
+                page_order = page_order + [page_id]
+            self._state = (page_order, pages)
+            if self.store is not None:
+                self._edited_at = time.time()
+                self.store.save_tips(page_order, pages, [page_id], edited_at=self._edited_at)
+        return True
+
+    def remove_page(self, page_id):
+        with self._lock:
+            self._load_from_store()
+            page_order, pages = self._state
+            if page_id not in pages:
+                return False
+            pages = {key: value for key, value in pages.items() if key != page_id}
+            page_order = [key for key in page_order if key != page_id]
+            self._state = (page_order, pages)
+            if self.store is not None:
+                self._edited_at = time.time()
+                self.store.save_tips(page_order, pages, [], edited_at=self._edited_at)
+        return True
+
+    def warm(self):
+        """
+        Sync the snapshot and build the retrieval index ahead of the first question.
+        """
+        self.ensure_fresh()
+        page_order, pages = self._state
+        with self._index_lock:
+            self._index.sync(page_order, pages)
+
+    def search_hits(self, question, top_k=TIPS_TOP_K, check_fresh=True):
+        """
+        Return the `top_k` tips chunks most relevant to `question` as retrieval Hits.
+
+        The retrieval index is brought up to date with the snapshot first, which only
+        re-indexes pages that changed. If nothing matches, the first chunks in
+        database order are returned so the mentor still gets some context.
+        Pass `check_fresh=False` if the caller has just called `ensure_fresh()`.
+        """
+        if check_fresh:
+            self.ensure_fresh()
+        page_order, pages = self._state
+        with self._index_lock:
+            self._index.sync(page_order, pages)
+            hits = self._index.hits(question, top_k)
+        if not hits:
+            hits = list(islice((Hit(page_id, position, text, 0.0) for page_id in page_order
+                                for position, text in enumerate(pages[page_id]["info"])), top_k))
+        return hits
+
+
+class SceneSnapshot(NotionSnapshot):
+    """
+    In-memory copy of the Scene Analysis database rows, in Notion's query order.
+
+    Only the properties the app reads are requested, which keeps each synced
+    page to a few hundred bytes however many columns the database grows.
+    """
+
+    store_key = "scenes"
+    properties = SCENE_PROPERTIES
+
+    def __init__(self, notion, database_id, policy=None, latest_policy=None, store=None):
+        super().__init__(notion, database_id, policy or TtlPolicy("scene_list", SCENE_SOFT_TTL, SCENE_HARD_TTL), store)
+        self.latest_policy = latest_policy or TtlPolicy("latest_scene", LATEST_SCENE_SOFT_TTL, LATEST_SCENE_HARD_TTL)
+        self._pages = []
+
+    def _load(self):
+        self._pages = self.store.load_scenes()
+
+    def _save(self, synced_at=None, edited_at=None):
+        self.store.save_scenes(self._pages, synced_at, edited_at)
+
+    def export(self):
+        return {"pages": self._pages}
+
+    def _apply(self, state):
+        self._pages = state["pages"]
+
+    def _property_ids(self, priority):
+        if not self.properties:
+            return None
+        return self.notion.property_ids(self.database_id, self.properties, priority=priority)
+
+    def _refresh(self, priority):
+        pages = list(self.notion.iter_database(self.database_id, priority=priority,
+                                               properties=self._property_ids(priority)))
+        self._pages = pages
+        if self.store is not None:
+            self._save()
+        return len(pages)
+
+    def add_page(self, page):
+        """
+        Record a page we just created so readers see it before the next sync.
+        """
+        with self._lock:
+            self._load_from_store()
+            self._pages = self._pages + [page]
+            self._save_edit()
+
+    def has_page(self, page_id):
+        return any(page.get('id') == page_id for page in self._pages)
+
+    def _refresh_page(self, page, priority):
+        with self._lock:
+            self._load_from_store()
+            pages = list(self._pages)
+            for i, existing in enumerate(pages):
+                if existing.get('id') == page['id']:
+                    pages[i] = page
+                    break
+            else:
+                pages.append(page)
+            self._pages = pages
+            self._save_edit()
+        return True
+
+    def remove_page(self, page_id):
+        with self._lock:
+            self._load_from_store()
+            if not self.has_page(page_id):
+                return False
+            self._pages = [page for page in self._pages if page.get('id') != page_id]
+            self._save_edit()
+        return True
+
+    def pages(self):
+        self.ensure_fresh()
+        return self._pages
+
+    def metrics(self):
+        return dict(super().metrics(), **{self.latest_policy.name: self.latest_policy.metrics(self.age())})
+
+    def latest_scene(self):
+        """
+        Return the most recently created scene, or None if the database is empty.
+        """
+        self.ensure_fresh(self.latest_policy)
+        pages = self._pages
+        if not pages:
+            return None
+        return max(pages, key=lambda page: page.get('created_time', ''))
+
+
+class SyncWorker(threading.Thread):
+    """
+    Daemon thread that keeps snapshots mirrored on a schedule, so the request
+    path reads from memory and never waits on Notion after the first sync.
+    """
+
+    def __init__(self, snapshots, interval=NOTION_SYNC_INTERVAL):
+        super().__init__(name="notion-sync", daemon=True)
+        self.snapshots = snapshots
+        self.interval = interval
+        self._stopped = threading.Event()
+        for snapshot in snapshots:
+            snapshot.refresh_on_read = False
+
+    def run(self):
+        while not self._stopped.is_set():
+            for snapshot in self.snapshots:
+                try:
+                    snapshot.sync(priority=BACKGROUND)
+                except Exception as e:
+                    print(f"⚠️ Background sync of {type(snapshot).__name__} failed: {e}")
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,282 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Local SQLite mirror of both Notion databases; set to an empty string to disable
+NOTION_MIRROR_PATH = os.getenv(
+    'NOTION_MIRROR_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'notion_mirror.sqlite3'),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tips_pages (
+    page_id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    last_edited_time TEXT
+);
+CREATE TABLE IF NOT EXISTS tips_blocks (
+    page_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (page_id, position)
+);
+CREATE TABLE IF NOT EXISTS tips_files (
+    block_id TEXT PRIMARY KEY,
+    last_edited_time TEXT,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pdf_texts (
+    content_hash TEXT PRIMARY KEY,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scenes (
+    page_id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    title TEXT,
+    created_time TEXT,
+    last_edited_time TEXT,
+    file_urls TEXT NOT NULL,
+    page_json TEXT NOT NULL,
+    extracted_text TEXT,
+    extracted_for TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS scene_search USING fts5(title, extracted_text);
+-- scene_search rows share their rowid with `scenes` and only change when a title or extracted text does.
+-- VACUUM may renumber those rowids, so rebuild scene_search after running it.
+CREATE TRIGGER IF NOT EXISTS scene_search_insert AFTER INSERT ON scenes BEGIN
+    INSERT INTO scene_search (rowid, title, extracted_text) VALUES (new.rowid, new.title, new.extracted_text);
+END;
+CREATE TRIGGER IF NOT EXISTS scene_search_delete AFTER DELETE ON scenes BEGIN
+    DELETE FROM scene_search WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS scene_search_update AFTER UPDATE OF title, extracted_text ON scenes
+WHEN old.title IS NOT new.title OR old.extracted_text IS NOT new.extracted_text BEGIN
+    UPDATE scene_search SET title = new.title, extracted_text = new.extracted_text WHERE rowid = old.rowid;
+END;
+"""
+
+
+def scene_title(page):
+    title = page.get('properties', {}).get('Title', {}).get('title', [])
+    return title[0]['text']['content'] if title else None
+
+
+def scene_file_urls(page):
+    urls = []
+    for file in page.get('properties', {}).get('Upload Scene', {}).get('files', []):
+        value = file.get(file.get('type'), {})
+        if value.get('url'):
+            urls.append(value['url'])
+    return urls
+
+
+def fts_query(text):
+    """
+    Turn free text into an FTS5 query that ORs every word, so punctuation in
+    user questions can't break the MATCH syntax.
+    """
+    return " OR ".join(f'"{word}"' for word in re.findall(r"\w+", text))
+
+
+class MirrorStore:
+    """
+    SQLite (WAL mode) mirror of the Acting Tips and Scene Analysis databases.
+
+    The file survives restarts and is shared by every worker process on the
+    host, so a worker can boot from another worker's sync instead of Notion.
+    Each thread gets its own connection, and a forked worker opens its own
+    rather than sharing the parent's.
+    """
+
+    def __init__(self, path=NOTION_MIRROR_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return _Transaction(db)
+
+    def _query(self, sql, params=()):
+        return self._connect().db.execute(sql, params).fetchall()
+
+    def synced_at(self, name):
+        rows = self._query("SELECT synced_at FROM sync_state WHERE name = ?", (name,))
+        return rows[0][0] if rows else None
+
+    def edited_at(self, name):
+        """
+        Wall-clock time of the last single-page edit written since a sync, or None.
+        """
+        return self.synced_at(f"{name}:edited")
+
+    # Acting Tips
+
+    def load_tips(self):
+        """
+        Return (page_order, {page_id: {"last_edited_time": ..., "info": [...]}}).
+        """
+        page_order = []
+        pages = {}
+        for page_id, last_edited_time in self._query(
+                "SELECT page_id, last_edited_time FROM tips_pages ORDER BY position"):
+            page_order.append(page_id)
+            pages[page_id] = {"last_edited_time": last_edited_time, "info": []}
+        for page_id, text in self._query("SELECT page_id, text FROM tips_blocks ORDER BY page_id, position"):
+            if page_id in pages:
+                pages[page_id]["info"].append(text)
+        return page_order, pages
+
+    def save_tips(self, page_order, pages, changed, synced_at=None, edited_at=None):
+        """
+        Store the tips page order and rewrite blocks only for `changed` pages.
+        A single-page edit passes `edited_at` and leaves the sync time alone.
+        """
+        with self._connect() as db:
+            db.execute("DELETE FROM tips_pages")
+            db.executemany(
+                "INSERT INTO tips_pages (page_id, position, last_edited_time) VALUES (?, ?, ?)",
+                [(page_id, position, pages[page_id]["last_edited_time"]) for position, page_id in enumerate(page_order)],
+            )
+            # Drop blocks of changed pages and of pages that were removed from Notion
+            db.execute("DELETE FROM tips_blocks WHERE page_id NOT IN (SELECT page_id FROM tips_pages)")
+            for page_id in changed:
+                if page_id not in pages:
+                    continue
+                db.execute("DELETE FROM tips_blocks WHERE page_id = ?", (page_id,))
+                db.executemany(
+                    "INSERT INTO tips_blocks (page_id, position, text) VALUES (?, ?, ?)",
+                    [(page_id, position, text) for position, text in enumerate(pages[page_id]["info"])],
+                )
+            db.mark_written("tips", synced_at, edited_at)
+
+    # PDFs attached to tips pages
+
+    def file_hash(self, block_id, last_edited_time):
+        """
+        Return the content hash recorded for this version of a file block, or None.
+        """
+        rows = self._query("SELECT content_hash FROM tips_files WHERE block_id = ? AND last_edited_time IS ?",
+                           (block_id, last_edited_time))
+        return rows[0][0] if rows else None
+
+    def save_file_hash(self, block_id, last_edited_time, content_hash):
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO tips_files (block_id, last_edited_time, content_hash) VALUES (?, ?, ?)",
+                       (block_id, last_edited_time, content_hash))
+
+    def pdf_text(self, content_hash):
+        rows = self._query("SELECT text FROM pdf_texts WHERE content_hash = ?", (content_hash,))
+        return rows[0][0] if rows else None
+
+    def save_pdf_text(self, content_hash, text):
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO pdf_texts (content_hash, text) VALUES (?, ?)", (content_hash, text))
+
+    # Scene Analysis
+
+    def load_scenes(self):
+        return [json.loads(row[0]) for row in self._query("SELECT page_json FROM scenes ORDER BY position")]
+
+    def save_scenes(self, pages, synced_at=None, edited_at=None):
+        """
+        Replace the mirrored scene rows, keeping any text already extracted for unchanged scenes.
+        Only rows that moved or changed are written, so the search index is left
+        alone by a sync that found nothing new.
+        A single-page edit passes `edited_at` and leaves the sync time alone.
+        """
+        with self._connect() as db:
+            page_ids = [page['id'] for page in pages]
+            db.execute(
+                f"DELETE FROM scenes WHERE page_id NOT IN ({','.join('?' * len(page_ids))})", page_ids)
+            db.executemany(
+                """
+                INSERT INTO scenes (page_id, position, title, created_time, last_edited_time, file_urls, page_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (page_id) DO UPDATE SET
+                    position = excluded.position, title = excluded.title,
+                    created_time = excluded.created_time, last_edited_time = excluded.last_edited_time,
+                    file_urls = excluded.file_urls, page_json = excluded.page_json
+                WHERE scenes.position != excluded.position OR scenes.page_json != excluded.page_json
+                """,
+                [
+                    (page['id'], position, scene_title(page), page.get('created_time'),
+                     page.get('last_edited_time'), json.dumps(scene_file_urls(page)), json.dumps(page))
+                    for position, page in enumerate(pages)
+                ],
+            )
+            db.mark_written("scenes", synced_at, edited_at)
+
+    def scene_text(self, page_id, last_edited_time):
+        """
+        Return text extracted earlier for this version of the scene, or None.
+        """
+        rows = self._query("SELECT extracted_text FROM scenes WHERE page_id = ? AND extracted_for = ?",
+                           (page_id, last_edited_time))
+        return rows[0][0] if rows else None
+
+    def save_scene_text(self, page_id, last_edited_time, text):
+        with self._connect() as db:
+            db.execute("UPDATE scenes SET extracted_text = ?, extracted_for = ? WHERE page_id = ?",
+                       (text, last_edited_time, page_id))
+
+    def search_scenes(self, text, limit=10):
+        """
+        Full-text search over scene titles and extracted scene text, best matches first.
+        Returns a list of {"id": ..., "title": ...}.
+        """
+        query = fts_query(text)
+        if not query:
+            return []
+        rows = self._query(
+            "SELECT scenes.page_id, scenes.title FROM scene_search JOIN scenes ON scenes.rowid = scene_search.rowid "
+            "WHERE scene_search MATCH ? ORDER BY bm25(scene_search) LIMIT ?", (query, limit))
+        return [{"id": page_id, "title": title} for page_id, title in rows]
+
+
+class _Transaction:
+    """
+    `with store._connect() as db:` runs the block in a single write transaction.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, *args):
+        return self.db.execute(*args)
+
+    def executemany(self, *args):
+        return self.db.executemany(*args)
+
+    def executescript(self, script):
+        return self.db.executescript(script)
+
+    def mark_synced(self, name, synced_at=None):
+        self.db.execute("INSERT OR REPLACE INTO sync_state (name, synced_at) VALUES (?, ?)",
+                        (name, synced_at or time.time()))
+
+    def mark_written(self, name, synced_at=None, edited_at=None):
+        if edited_at is not None:
+            self.mark_synced(f"{name}:edited", edited_at)
+        else:
+            self.mark_synced(name, synced_at)
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
@@ -0,0 +1,420 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from urllib.parse import quote
+
+import httpx
+
+try:
+    import orjson
+except ImportError:  # Responses are decoded with the standard library instead
+    orjson = None
+
+NOTION_API_URL = os.getenv('NOTION_API_URL', "https://api.notion.com/v1")
+NOTION_VERSION = "2022-06-28"
+
+# Notion never returns more than 100 results per call
+MAX_PAGE_SIZE = 100
+
+# Connection pool settings for the shared client
+NOTION_HTTP2 = os.getenv('NOTION_HTTP2', 'false').lower() == 'true'
+NOTION_MAX_CONNECTIONS = int(os.getenv('NOTION_MAX_CONNECTIONS', 10))
+NOTION_MAX_KEEPALIVE = int(os.getenv('NOTION_MAX_KEEPALIVE', 10))
+NOTION_KEEPALIVE_EXPIRY = float(os.getenv('NOTION_KEEPALIVE_EXPIRY', 60))
+NOTION_TIMEOUT = float(os.getenv('NOTION_TIMEOUT', 30))
+NOTION_CONNECT_TIMEOUT = float(os.getenv('NOTION_CONNECT_TIMEOUT', 5))
+
+# Consecutive failures (timeouts, connection errors, 5xx) before Notion calls fail fast,
+# and how long to wait before letting a probe request through
+NOTION_BREAKER_FAILURES = int(os.getenv('NOTION_BREAKER_FAILURES', 5))
+NOTION_BREAKER_RESET = float(os.getenv('NOTION_BREAKER_RESET', 30))
+
+# Notion allows an average of 3 requests per second per integration
+NOTION_RATE_LIMIT = float(os.getenv('NOTION_RATE_LIMIT', 3))
+NOTION_RATE_BURST = int(os.getenv('NOTION_RATE_BURST', 3))
+NOTION_MAX_RETRIES = int(os.getenv('NOTION_MAX_RETRIES', 3))
+
+# Request priorities: lower values are scheduled first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+def notion_headers(notion_token):
+    return {
+        "Authorization": f"Bearer {notion_token}",
+        "Content-Type": "application/json",
+        "Notion-Version": NOTION_VERSION,
+    }
+
+
+def normalize_id(notion_id):
+    """
+    Notion IDs are UUIDs that show up both with and without dashes.
+    """
+    return (notion_id or "").replace("-", "").lower()
+
+
+def decode_json(content):
+    """
+    Decode a response body, with orjson when it is installed (several times faster on large pages).
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _paginate(send, page_size=MAX_PAGE_SIZE, limit=None):
+    """
+    Follow `has_more`/`next_cursor` and yield results as each page arrives.
+
+    `send(cursor, page_size)` performs one request. When `limit` is given we stop
+    after that many results and shrink the last request so no extra rows are fetched.
+    """
+    cursor = None
+    yielded = 0
+    while True:
+        size = min(page_size, MAX_PAGE_SIZE)
+        if limit is not None:
+            if yielded >= limit:
+                return
+            size = min(size, limit - yielded)
+
+        response = send(cursor, size)
+        data = decode_json(response.content)
+        if response.status_code != 200:
+            raise ValueError(f"Notion API error: {data}")
+
+        for result in data.get('results', []):
+            yield result
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+
+        cursor = data.get('next_cursor')
+        if not data.get('has_more') or not cursor:
+            return
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every Notion call in the process.
+
+    Callers queue by priority, so interactive requests are granted tokens
+    before background syncs that are already waiting. A 429 `Retry-After`
+    pauses the whole bucket, since the limit is per integration.
+    """
+
+    def __init__(self, rate=NOTION_RATE_LIMIT, burst=NOTION_RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, seq) tickets
+        self._seq = itertools.count()
+        self._stats = {
+            name: {"acquired": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+        self._throttled = 0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=INTERACTIVE):
+        """
+        Block until this caller may send one request. Returns the seconds spent waiting.
+        """
+        start = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiting[0] != ticket:
+                        # Someone ahead of us is waiting; they notify when they're done
+                        self._cond.wait()
+                        continue
+                    if now >= self._paused_until and self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+                    self._cond.wait(delay)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - start
+            stats = self._stats[PRIORITY_NAMES.get(priority, "background")]
+            stats["acquired"] += 1
+            stats["total_wait"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+        return waited
+
+    def pause(self, seconds):
+        """
+        Stop handing out tokens for `seconds`, e.g. after Notion answered 429.
+        """
+        with self._cond:
+            self._throttled += 1
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def metrics(self):
+        with self._cond:
+            waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiting:
+                waiting[PRIORITY_NAMES.get(priority, "background")] += 1
+            return {
+                "queue_depth": len(self._waiting),
+                "waiting": waiting,
+                "throttled": self._throttled,
+                "paused_for": max(0.0, self._paused_until - time.monotonic()),
+                "wait": {
+                    name: dict(stats, avg_wait=stats["total_wait"] / stats["acquired"] if stats["acquired"] else 0.0)
+                    for name, stats in self._stats.items()
+                },
+            }
+
+
+class NotionUnavailable(httpx.HTTPError):
+    """
+    Raised instead of calling Notion while the circuit breaker is open.
+    """
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Stops calling Notion after repeated failures so requests fail fast
+    instead of each waiting out a timeout.
+
+    After `failure_threshold` consecutive failures the breaker opens and every
+    call raises NotionUnavailable. Once `reset_timeout` has passed it goes
+    half-open and lets a single probe request through: success closes it,
+    failure opens it for another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold=NOTION_BREAKER_FAILURES, reset_timeout=NOTION_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "rejected": 0, "probes": 0}
+
+    def allow(self):
+        """
+        Raise NotionUnavailable unless a request may be sent now.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                self._stats["probes"] += 1
+                return
+            self._stats["rejected"] += 1
+            if self.state == HALF_OPEN:
+                raise NotionUnavailable("Notion is unavailable (circuit half_open, waiting on the probe request)")
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            raise NotionUnavailable(f"Notion is unavailable (circuit {self.state}, next probe in {retry_in:.0f}s)")
+
+    def release_probe(self):
+        """
+        Let another request probe when ours ended without telling us whether Notion is healthy.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                print("✅ Notion is reachable again, circuit closed")
+                self.state = CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                print(f"⚠️ Notion failed {self._failures} times in a row, circuit open for {self.reset_timeout:.0f}s")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._stats["opened"] += 1
+
+    def metrics(self):
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            return dict(
+                self._stats,
+                state=self.state,
+                consecutive_failures=self._failures,
+                failure_threshold=self.failure_threshold,
+                reset_timeout=self.reset_timeout,
+                next_probe_in=retry_in,
+                probe_in_flight=self.state == HALF_OPEN and self._probing,
+            )
+
+
+class NotionClient:
+    """
+    Pooled Notion API client shared by every request in the process.
+
+    Connections are kept alive between calls so only the first request to
+    api.notion.com pays for the TCP+TLS handshake. Auth and version headers
+    are set once on the underlying `httpx.Client`. Every request goes through
+    the shared RateLimiter and is retried after `Retry-After` on a 429.
+    Timeouts, connection and decoding errors and 5xx responses count against
+    the CircuitBreaker, which fails calls fast while Notion is down.
+    """
+
+    def __init__(self, notion_token, base_url=None, http2=NOTION_HTTP2,
+                 max_connections=NOTION_MAX_CONNECTIONS, max_keepalive=NOTION_MAX_KEEPALIVE,
+                 keepalive_expiry=NOTION_KEEPALIVE_EXPIRY, timeout=NOTION_TIMEOUT,
+                 rate_limiter=None, max_retries=NOTION_MAX_RETRIES, breaker=None,
+                 connect_timeout=NOTION_CONNECT_TIMEOUT):
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        # database_id -> {property name: property ID}
+        self._schemas = {}
+        self._schema_lock = threading.Lock()
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        client_args = dict(
+            base_url=base_url or NOTION_API_URL,
+            headers=notion_headers(notion_token),
+            limits=limits,
+            timeout=httpx.Timeout(timeout, connect=min(connect_timeout, timeout)),
+        )
+        try:
+            self._http = httpx.Client(http2=http2, **client_args)
+        except ImportError:
+            # HTTP/2 needs the optional `h2` package (pip install httpx[http2])
+            print("⚠️ Warning: NOTION_HTTP2 is set but h2 is not installed, falling back to HTTP/1.1")
+            self._http = httpx.Client(**client_args)
+
+    def request(self, method, path, priority=INTERACTIVE, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.breaker.allow()
+            # Whatever happens, report back, or a half-open breaker waits on this probe forever
+            try:
+                self.rate_limiter.acquire(priority)
+                response = self._http.request(method, path, **kwargs)
+            except httpx.HTTPError:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+            try:
+                retry_after = float(response.headers.get("Retry-After", 1))
+            except ValueError:
+                retry_after = 1.0
+            print(f"⚠️ Notion rate limited {method} {path}, retrying in {retry_after}s")
+            self.rate_limiter.pause(retry_after)
+
+    def create_page(self, payload):
+        return self.request("POST", "/pages", json=payload)
+
+    def retrieve_page(self, page_id, priority=INTERACTIVE, properties=None):
+        """
+        Return a page object, or None if the page no longer exists or we lost access to it.
+        `properties` limits the returned properties to these property IDs.
+        """
+        params = {'filter_properties': list(properties)} if properties else None
+        response = self.request("GET", f"/pages/{quote(page_id)}", priority=priority, params=params)
+        if response.status_code == 404:
+            return None
+        data = decode_json(response.content)
+        if response.status_code != 200:
+            raise ValueError(f"Notion API error: {data}")
+        return data
+
+    def property_ids(self, database_id, names, priority=INTERACTIVE):
+        """
+        Map property names to the IDs `filter_properties` expects, from the database schema.
+        Returns None if any name is missing, in which case callers should fetch every property.
+        The schema is fetched once per database.
+        """
+        with self._schema_lock:
+            schema = self._schemas.get(database_id)
+        if schema is None:
+            response = self.request("GET", f"/databases/{quote(database_id)}", priority=priority)
+            data = decode_json(response.content)
+            if response.status_code != 200:
+                raise ValueError(f"Notion API error: {data}")
+            schema = {name: value['id'] for name, value in data.get('properties', {}).items()}
+            with self._schema_lock:
+                self._schemas[database_id] = schema
+        missing = [name for name in names if name not in schema]
+        if missing:
+            print(f"⚠️ Warning: Properties {missing} not found in database {database_id}, fetching all properties")
+            return None
+        return [schema[name] for name in names]
+
+    def iter_database(self, database_id, body=None, page_size=MAX_PAGE_SIZE, limit=None,
+                      priority=INTERACTIVE, properties=None):
+        """
+        Yield every page of a Notion database query, lazily fetching further pages.
+        `body` may carry `filter`/`sorts`; the cursor and page size are filled in here.
+        `properties` limits each page's properties to these property IDs (see `property_ids`).
+        """
+        params = {'filter_properties': list(properties)} if properties else None
+
+        def send(cursor, size):
+            payload = dict(body or {}, page_size=size)
+            if cursor:
+                payload['start_cursor'] = cursor
+            return self.request("POST", f"/databases/{quote(database_id)}/query", priority=priority,
+                                params=params, json=payload)
+
+        return _paginate(send, page_size, limit)
+
+    def iter_block_children(self, block_id, page_size=MAX_PAGE_SIZE, limit=None, priority=INTERACTIVE):
+        """
+        Yield every child block of a page or block, lazily fetching further pages.
+        """
+        def send(cursor, size):
+            params = {'page_size': size}
+            if cursor:
+                params['start_cursor'] = cursor
+            return self.request("GET", f"/blocks/{quote(block_id)}/children", priority=priority, params=params)
+
+        return _paginate(send, page_size, limit)
+
+    def close(self):
+        self._http.close()
@@ -0,0 +1,235 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import PyPDF2
+import requests
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+
+# Limits for downloading scene and tips PDFs
+PDF_CONNECT_TIMEOUT = float(os.getenv('PDF_CONNECT_TIMEOUT', 5))
+PDF_READ_TIMEOUT = float(os.getenv('PDF_READ_TIMEOUT', 30))
+# Give up on a download that is still trickling in after this many seconds
+PDF_DOWNLOAD_DEADLINE = float(os.getenv('PDF_DOWNLOAD_DEADLINE', 120))
+PDF_MAX_BYTES = int(os.getenv('PDF_MAX_BYTES', 25 * 1024 * 1024))
+PDF_CHUNK_BYTES = 64 * 1024
+
+# PDF readers accept the header anywhere in the first 1024 bytes
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_WINDOW = 1024
+
+# Worker processes for page-parallel text extraction of long PDFs; below 2 every PDF is parsed in-process
+PDF_EXTRACT_PROCESSES = int(os.getenv('PDF_EXTRACT_PROCESSES', min(4, os.cpu_count() or 1)))
+# PDFs with fewer pages are parsed in-process, where they finish before the pool would pay off
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 40))
+
+
+class PdfDownloadError(requests.exceptions.RequestException):
+    """
+    The download was refused: too large, too slow or not a PDF.
+    """
+
+
+def _check_magic(buffer, size, file_url):
+    if buffer.find(PDF_MAGIC, 0, min(size, PDF_MAGIC_WINDOW)) < 0:
+        raise PdfDownloadError(f"{file_url} is not a PDF")
+
+
+def download_pdf(file_url, max_bytes=PDF_MAX_BYTES, timeout=(PDF_CONNECT_TIMEOUT, PDF_READ_TIMEOUT),
+                 deadline=PDF_DOWNLOAD_DEADLINE):
+    """
+    Stream a PDF into memory and return it as a memoryview.
+
+    The body is read in chunks into a buffer pre-sized from Content-Length
+    (grown geometrically if the server doesn't send one). The download is aborted as soon as it
+    exceeds `max_bytes` or `deadline` seconds, or its first bytes don't
+    look like a PDF. Each read returns whatever has arrived, so a server
+    trickling the body is cut off at the deadline rather than after a full chunk,
+    and no single read waits longer than the deadline.
+    """
+    start = time.monotonic()
+    connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    timeout = (connect_timeout, min(read_timeout, deadline))
+    with requests.get(file_url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        try:
+            expected = int(response.headers.get("Content-Length", ""))
+        except ValueError:
+            expected = None
+        if expected is not None and expected > max_bytes:
+            raise PdfDownloadError(f"PDF is {expected} bytes, over the {max_bytes} byte limit", response=response)
+
+        buffer = bytearray(expected or 0)
+        size = 0
+        checked = False
+        while chunk := _read_some(response, PDF_CHUNK_BYTES):
+            end = size + len(chunk)
+            if end > max_bytes:
+                raise PdfDownloadError(f"PDF is over the {max_bytes} byte limit", response=response)
+            if end > len(buffer):
+                # No (or a wrong) Content-Length: grow geometrically
+                buffer.extend(bytes(max(end - len(buffer), len(buffer))))
+            buffer[size:end] = chunk
+            size = end
+            if not checked and size >= PDF_MAGIC_WINDOW:
+                _check_magic(buffer, size, file_url)
+                checked = True
+            if time.monotonic() - start > deadline:
+                raise PdfDownloadError(f"PDF download took over {deadline:.0f}s", response=response)
+        if not checked:
+            _check_magic(buffer, size, file_url)
+    return memoryview(buffer)[:size]
+
+
+def _read_some(response, amt):
+    # read1 returns as soon as any data arrives; map urllib3 errors the way iter_content does
+    try:
+        return response.raw.read1(amt, decode_content=True)
+    except ReadTimeoutError as e:
+        raise requests.exceptions.ConnectionError(e, response=response) from e
+    except ProtocolError as e:
+        raise requests.exceptions.ChunkedEncodingError(e, response=response) from e
+    except DecodeError as e:
+        raise requests.exceptions.ContentDecodingError(e, response=response) from e
+
+
+class BufferStream(io.RawIOBase):
+    """
+    Read-only, seekable file object over a memoryview, so a downloaded buffer
+    (bytearray, mmap, ...) can be parsed without copying it into a BytesIO.
+    """
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, b):
+        chunk = self._view[self._pos:self._pos + len(b)]
+        n = len(chunk)
+        b[:n] = chunk
+        self._pos += n
+        return n
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else self._pos + size
+        data = self._view[self._pos:end].tobytes()
+        self._pos += len(data)
+        return data
+
+
+def open_buffer(data):
+    """
+    Wrap PDF data in a file object without copying it. A BytesIO shares the
+    buffer of the `bytes` it is created from; other buffers get a BufferStream.
+    """
+    if isinstance(data, bytes):
+        return io.BytesIO(data)
+    return BufferStream(data)
+
+
+_pools = {}  # worker count -> ProcessPoolExecutor
+_pools_lock = threading.Lock()
+
+
+def extraction_pool(processes=PDF_EXTRACT_PROCESSES):
+    """
+    The process pool shared by page-parallel extractions, started on first use.
+
+    Workers are spawned rather than forked, so they don't inherit the locks
+    and sockets of a threaded web worker. A spawned worker re-runs the main
+    script as `__mp_main__`, so a main script with startup side effects has
+    to skip them there (see `POOL_WORKER` in app.py).
+    """
+    with _pools_lock:
+        pool = _pools.get(processes)
+        if pool is None:
+            pool = _pools[processes] = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+        return pool
+
+
+def _discard_pool(processes, pool):
+    with _pools_lock:
+        if _pools.get(processes) is pool:
+            del _pools[processes]
+    pool.shutdown(wait=False)
+
+
+def _extract_pages(data, start, stop):
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return "".join(reader.pages[number].extract_text() or "" for number in range(start, stop))
+
+
+def extract_text_from_bytes(data, processes=PDF_EXTRACT_PROCESSES, min_pages=PDF_PARALLEL_MIN_PAGES):
+    """
+    Extract text from PDF data already in memory (bytes, bytearray or memoryview).
+
+    PDFs of at least `min_pages` pages are split into one contiguous page range
+    per worker process (see `extraction_pool`) and the texts joined back in page
+    order, so a long script doesn't hold the GIL for seconds. Every call builds
+    its own reader, so this is safe to call from many threads.
+    """
+    reader = PyPDF2.PdfReader(open_buffer(data))
+    page_count = len(reader.pages)
+    if processes < 2 or page_count < min_pages:
+        return "".join(page.extract_text() or "" for page in reader.pages)
+
+    # Each worker gets a copy of the file and parses it once for its whole range
+    data = bytes(data)
+    step = -(-page_count // processes)
+    pool = extraction_pool(processes)
+    try:
+        futures = [pool.submit(_extract_pages, data, start, min(start + step, page_count))
+                   for start in range(0, page_count, step)]
+        return "".join(future.result() for future in futures)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time and finish here
+        _discard_pool(processes, pool)
+        return "".join(page.extract_text() or "" for page in reader.pages)
+
+
+def chunk_text(text, max_chars=1200):
+    """
+    Split extracted PDF text into chunks of whole lines, each at most `max_chars` long
+    (a single longer line is split on its own).
+    """
+    chunks = []
+    current = ""
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if not line:
+            continue
+        while len(line) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and len(current) + 1 + len(line) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
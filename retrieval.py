@@ -0,0 +1,445 @@
+import base64
+import io
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict, namedtuple
+
+import numpy as np
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a characters-per-token estimate, see packing_metrics()
+    tiktoken = None
+
+# Which retriever ranks tips chunks: "bm25" (default) or "tfidf"
+TIPS_RETRIEVER = os.getenv('TIPS_RETRIEVER', 'bm25').lower()
+# Where the TF-IDF arrays are saved for other workers to memory-map; empty keeps them in memory
+TFIDF_INDEX_DIR = os.getenv(
+    'TFIDF_INDEX_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tfidf_index'),
+)
+
+# Context window of each chat model we call, in tokens
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+# Most tokens of retrieved context per prompt, which keeps OpenAI latency predictable
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 2000))
+# Tokens the chat format adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Words too common in questions to say anything about which tip is relevant
+STOPWORDS = frozenset("""
+a about an and are as at be but by can do does for from how i if in is it me my of on or so
+that the this to was what when where which who why will with you your
+""".split())
+
+
+def tokenize(text):
+    return [word for word in re.findall(r"\w+", text.lower()) if word not in STOPWORDS]
+
+
+_encodings = {}
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """
+    Count OpenAI tokens in `text`, estimating at ~4 characters per token without tiktoken.
+    """
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("cl100k_base")
+    return len(_encodings[model].encode(text))
+
+
+PackedContext = namedtuple('PackedContext', 'chunks packed_tokens dropped dropped_tokens')
+# A ranked chunk and where it came from: the tips page and the chunk's position on it
+Hit = namedtuple('Hit', 'page_id position text score')
+
+_packing_lock = threading.Lock()
+_packing_stats = {"prompts": 0, "packed_chunks": 0, "packed_tokens": 0, "dropped_chunks": 0, "dropped_tokens": 0}
+
+
+def pack_context(chunks, model, reserved_text="", max_tokens=0, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Greedily keep the best-ranked chunks that fit in the prompt.
+
+    Room is reserved for `reserved_text` (the prompt template and the user's
+    question) and for the `max_tokens` completion. The chunks may then use
+    whatever is left of the model's context window, up to `budget` tokens.
+    A chunk that doesn't fit is skipped, but smaller chunks after it can still
+    be packed.
+    """
+    window = MODEL_CONTEXT_WINDOWS.get(model, 4096)
+    reserved = count_tokens(reserved_text, model) + max_tokens + 2 * MESSAGE_OVERHEAD_TOKENS
+    available = max(0, min(budget, window - reserved))
+
+    packed = []
+    packed_tokens = dropped = dropped_tokens = 0
+    for chunk in chunks:
+        # +1 for the separator the caller joins chunks with
+        tokens = count_tokens(chunk, model) + 1
+        if packed_tokens + tokens <= available:
+            packed.append(chunk)
+            packed_tokens += tokens
+        else:
+            dropped += 1
+            dropped_tokens += tokens
+
+    with _packing_lock:
+        _packing_stats["prompts"] += 1
+        _packing_stats["packed_chunks"] += len(packed)
+        _packing_stats["packed_tokens"] += packed_tokens
+        _packing_stats["dropped_chunks"] += dropped
+        _packing_stats["dropped_tokens"] += dropped_tokens
+    return PackedContext(packed, packed_tokens, dropped, dropped_tokens)
+
+
+def packing_metrics():
+    with _packing_lock:
+        return dict(_packing_stats, budget=CONTEXT_TOKEN_BUDGET,
+                    token_counter="tiktoken" if tiktoken is not None else "estimate")
+
+
+class BM25Index:
+    """
+    Okapi BM25 over paragraph-level chunks, grouped by Notion page.
+
+    The index is updated a page at a time: `sync()` compares the snapshot
+    state it was given last time and only re-indexes pages whose chunk list
+    changed, so a warm index costs nothing per question.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)  # term -> {chunk_id: term frequency}
+        self._lengths = {}  # chunk_id -> number of tokens
+        self._texts = {}  # chunk_id -> original text
+        self._page_chunks = {}  # page_id -> [chunk_id, ...]
+        self._indexed = {}  # page_id -> chunk list object the page was indexed from
+        self._page_rank = {}  # page_id -> position in the database
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def remove_page(self, page_id):
+        for chunk_id in self._page_chunks.pop(page_id, []):
+            for term in set(tokenize(self._texts.pop(chunk_id))):
+                postings = self._postings[term]
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._lengths.pop(chunk_id)
+        self._indexed.pop(page_id, None)
+
+    def set_page(self, page_id, chunks):
+        self.remove_page(page_id)
+        chunk_ids = []
+        for position, text in enumerate(chunks):
+            chunk_id = (page_id, position)
+            terms = tokenize(text)
+            for term, frequency in Counter(terms).items():
+                self._postings[term][chunk_id] = frequency
+            self._lengths[chunk_id] = len(terms)
+            self._texts[chunk_id] = text
+            self._total_length += len(terms)
+            chunk_ids.append(chunk_id)
+        self._page_chunks[page_id] = chunk_ids
+        self._indexed[page_id] = chunks
+
+    def sync(self, page_order, pages):
+        """
+        Bring the index in line with a TipsSnapshot state. Returns the number of pages re-indexed.
+        """
+        for page_id in set(self._indexed) - set(pages):
+            self.remove_page(page_id)
+        reindexed = 0
+        for page_id in page_order:
+            chunks = pages[page_id]["info"]
+            if self._indexed.get(page_id) is not chunks:
+                self.set_page(page_id, chunks)
+                reindexed += 1
+        self._page_rank = {page_id: rank for rank, page_id in enumerate(page_order)}
+        return reindexed
+
+    def search(self, query, top_k=8):
+        """
+        Return up to `top_k` chunk texts ranked by BM25 score against `query`.
+        """
+        return [hit.text for hit in self.hits(query, top_k)]
+
+    def hits(self, query, top_k=8):
+        if not self._lengths:
+            return []
+        count = len(self._lengths)
+        average_length = self._total_length / count or 1
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / average_length)
+                scores[chunk_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores, key=lambda chunk_id: (-scores[chunk_id], self._order_key(chunk_id)))
+        return [Hit(*chunk_id, self._texts[chunk_id], scores[chunk_id]) for chunk_id in ranked[:top_k]]
+
+    def _order_key(self, chunk_id):
+        page_id, position = chunk_id
+        return self._page_rank.get(page_id, len(self._page_rank)), position
+
+
+def state_signature(page_order, pages):
+    """
+    Identify a tips snapshot state by its pages and their edit times.
+    """
+    return [[page_id, pages[page_id]["last_edited_time"]] for page_id in page_order]
+
+
+class TfidfIndex:
+    """
+    TF-IDF retriever whose chunk vectors live in CSR arrays (`indptr`,
+    `indices`, `data`), so one vectorized sparse-dot scores a question against
+    every chunk.
+
+    Unlike BM25Index, IDF weights depend on the whole corpus, so any page
+    change triggers a full rebuild. When `directory` is set the arrays are
+    saved as .npy files after each build. Other workers memory-map them at
+    startup instead of rebuilding, as long as the saved state signature
+    matches their snapshot.
+
+    Each build is written to its own `builds/<name>/` directory and published
+    by atomically replacing the `CURRENT` file that names it, so a reader
+    never mixes arrays from two builds. Files of a published build are never
+    rewritten.
+    """
+
+    ARRAYS = ("indptr", "indices", "data", "rows", "idf")
+    # Newest builds kept on disk, the current one among them, for readers that resolved CURRENT just before it moved
+    KEEP_BUILDS = 3
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._vocabulary = {}
+        self._texts = []
+        self._chunk_ids = []
+        self._indexed = None  # {page_id: chunk list object} the arrays were built from
+        self._signature = None
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.data = np.zeros(0, dtype=np.float32)
+        self.rows = np.zeros(0, dtype=np.int32)
+        self.idf = np.zeros(0, dtype=np.float32)
+        if directory:
+            self.load()
+
+    def __len__(self):
+        return len(self._texts)
+
+    def build(self, page_order, pages):
+        chunk_terms = []
+        self._texts = []
+        self._chunk_ids = []
+        for page_id in page_order:
+            for position, text in enumerate(pages[page_id]["info"]):
+                chunk_terms.append(Counter(tokenize(text)))
+                self._texts.append(text)
+                self._chunk_ids.append([page_id, position])
+
+        self._vocabulary = {}
+        for terms in chunk_terms:
+            for term in terms:
+                self._vocabulary.setdefault(term, len(self._vocabulary))
+
+        lengths = np.fromiter((len(terms) for terms in chunk_terms), dtype=np.int64, count=len(chunk_terms))
+        self.indptr = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        nnz = int(self.indptr[-1])
+        self.indices = np.fromiter(
+            (self._vocabulary[term] for terms in chunk_terms for term in terms), dtype=np.int32, count=nnz)
+        tf = np.fromiter((count for terms in chunk_terms for count in terms.values()), dtype=np.float32, count=nnz)
+        self.rows = np.repeat(np.arange(len(chunk_terms), dtype=np.int32), lengths)
+
+        # Smoothed IDF, as in scikit-learn
+        df = np.bincount(self.indices, minlength=len(self._vocabulary))
+        self.idf = (np.log((1 + len(chunk_terms)) / (1 + df)) + 1).astype(np.float32)
+
+        # Sublinear TF, then L2-normalise each chunk vector so scores are cosines
+        data = (1 + np.log(tf)) * self.idf[self.indices]
+        norms = np.sqrt(np.bincount(self.rows, weights=data * data, minlength=len(chunk_terms)))
+        self.data = (data / np.maximum(norms[self.rows], 1e-12)).astype(np.float32)
+
+        self._indexed = {page_id: pages[page_id]["info"] for page_id in page_order}
+        self._signature = state_signature(page_order, pages)
+        if self.directory:
+            self.save()
+
+    def sync(self, page_order, pages):
+        """
+        Rebuild if the snapshot state differs from the one the index was built from.
+        Returns the number of pages indexed (0 when nothing changed).
+        """
+        if self._indexed is not None:
+            unchanged = list(self._indexed) == list(page_order) and all(
+                self._indexed[page_id] is pages[page_id]["info"] for page_id in page_order)
+            if unchanged:
+                return 0
+        if self._indexed is None and self._signature == state_signature(page_order, pages):
+            # Arrays memory-mapped from disk were built from this exact state
+            self._indexed = {page_id: pages[page_id]["info"] for page_id in page_order}
+            return 0
+        self.build(page_order, pages)
+        return len(page_order)
+
+    def scores(self, query):
+        """
+        Cosine similarity of `query` against every chunk, as one dense array.
+        """
+        query_vector = np.zeros(len(self.idf), dtype=np.float32)
+        for term, count in Counter(tokenize(query)).items():
+            column = self._vocabulary.get(term)
+            if column is not None:
+                query_vector[column] = (1 + math.log(count)) * self.idf[column]
+        norm = np.linalg.norm(query_vector)
+        if not norm:
+            return np.zeros(len(self._texts), dtype=np.float32)
+        return np.bincount(self.rows, weights=self.data * query_vector[self.indices],
+                           minlength=len(self._texts)) / norm
+
+    def search(self, query, top_k=8):
+        return [hit.text for hit in self.hits(query, top_k)]
+
+    def hits(self, query, top_k=8):
+        if not self._texts:
+            return []
+        scores = self.scores(query)
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        # Highest score first; ties keep database order
+        ranked = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [Hit(*self._chunk_ids[i], self._texts[i], float(scores[i])) for i in ranked]
+
+    def save(self):
+        builds = os.path.join(self.directory, "builds")
+        # Names sort by creation time; the suffix keeps concurrent writers apart
+        build = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        tmp_dir = os.path.join(builds, f".{build}.tmp")
+        os.makedirs(tmp_dir)
+        for name in self.ARRAYS:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.asarray(getattr(self, name)))
+        manifest = {
+            "vocabulary": self._vocabulary,
+            "texts": self._texts,
+            "chunk_ids": self._chunk_ids,
+            "signature": self._signature,
+        }
+        with open(os.path.join(tmp_dir, "manifest.json"), 'w') as f:
+            json.dump(manifest, f)
+        os.rename(tmp_dir, os.path.join(builds, build))
+
+        pointer = os.path.join(self.directory, "CURRENT")
+        tmp_pointer = f"{pointer}.{build}.tmp"
+        with open(tmp_pointer, 'w') as f:
+            f.write(build)
+        os.replace(tmp_pointer, pointer)
+        self._prune(builds, build)
+
+    def _prune(self, builds, current):
+        names = sorted(name for name in os.listdir(builds) if not name.startswith("."))
+        keep = set(names[-self.KEEP_BUILDS:]) | {current}
+        for name in names:
+            if name not in keep:
+                shutil.rmtree(os.path.join(builds, name), ignore_errors=True)
+
+    def to_record(self):
+        """
+        Serialise the index (arrays as base64-encoded .npy) for a knowledge snapshot file.
+        """
+        arrays = {}
+        for name in self.ARRAYS:
+            buffer = io.BytesIO()
+            np.save(buffer, np.asarray(getattr(self, name)))
+            arrays[name] = base64.b64encode(buffer.getvalue()).decode()
+        return {
+            "kind": "tfidf",
+            "arrays": arrays,
+            "vocabulary": self._vocabulary,
+            "texts": self._texts,
+            "chunk_ids": self._chunk_ids,
+            "signature": self._signature,
+        }
+
+    def load_record(self, record):
+        if record.get("kind") != "tfidf":
+            return
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(io.BytesIO(base64.b64decode(record["arrays"][name]))))
+        self._vocabulary = record["vocabulary"]
+        self._texts = record["texts"]
+        self._chunk_ids = record["chunk_ids"]
+        self._signature = record["signature"]
+        self._indexed = None
+        if self.directory:
+            self.save()
+
+    def load(self, attempts=3):
+        """
+        Memory-map the build CURRENT points at. Returns False if there is none.
+        """
+        for attempt in range(attempts):
+            try:
+                with open(os.path.join(self.directory, "CURRENT")) as f:
+                    build = os.path.join(self.directory, "builds", f.read().strip())
+            except FileNotFoundError:
+                return False
+            try:
+                with open(os.path.join(build, "manifest.json")) as f:
+                    manifest = json.load(f)
+                arrays = {name: np.load(os.path.join(build, f"{name}.npy"), mmap_mode='r')
+                          for name in self.ARRAYS}
+                break
+            except FileNotFoundError:
+                # Pruned after newer builds were published; CURRENT has moved on, so look again
+                continue
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Warning: Could not load TF-IDF index from {build}: {e}")
+                return False
+        else:
+            return False
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        self._vocabulary = manifest["vocabulary"]
+        self._texts = manifest["texts"]
+        self._chunk_ids = manifest["chunk_ids"]
+        self._signature = manifest["signature"]
+        self._indexed = None
+        return True
+
+
+def make_index(kind=TIPS_RETRIEVER, directory=TFIDF_INDEX_DIR):
+    """
+    Build the retriever selected by TIPS_RETRIEVER ("bm25" or "tfidf").
+    """
+    if kind == "tfidf":
+        return TfidfIndex(directory or None)
+    if kind != "bm25":
+        print(f"⚠️ Warning: Unknown TIPS_RETRIEVER {kind!r}, using bm25")
+    return BM25Index()
@@ -0,0 +1,189 @@
+"""
+Portable knowledge snapshot: the full Acting Tips and Scene Analysis state,
+extracted PDF text and any prebuilt retrieval index, in one file.
+
+The file is JSON Lines: a header line followed by one record per line. It is
+optionally wrapped in a zlib stream, which readers detect automatically. Bake
+a snapshot at deploy time so new workers boot from it instead of crawling
+Notion:
+
+    python snapshot_file.py build knowledge.snapshot [--no-compress]
+    python snapshot_file.py inspect knowledge.snapshot
+
+`build` reads NOTION_TOKEN, NOTION_DATABASE_ID and NOTION_DATABASE_ID_SCENE
+from the environment (or .env).
+"""
+import argparse
+import json
+import os
+import time
+import zlib
+
+SNAPSHOT_FORMAT = "sac-knowledge-snapshot"
+SNAPSHOT_VERSION = 1
+
+# Snapshot file to boot from, if it exists
+KNOWLEDGE_SNAPSHOT_PATH = os.getenv('KNOWLEDGE_SNAPSHOT_PATH', '')
+
+
+def snapshot_records(tips_snapshot, scene_snapshot, pdf_ingestor=None):
+    tips = tips_snapshot.export()
+    yield {
+        "type": "header",
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "created_at": time.time(),
+        "tips_database_id": tips_snapshot.database_id,
+        "scene_database_id": scene_snapshot.database_id,
+        "tips_synced_at": tips_snapshot.synced_at(),
+        "scenes_synced_at": scene_snapshot.synced_at(),
+    }
+    for page_id in tips["page_order"]:
+        yield dict(tips["pages"][page_id], type="tips_page", page_id=page_id)
+    for page in scene_snapshot.export()["pages"]:
+        yield {"type": "scene", "page": page}
+    if pdf_ingestor is not None:
+        state = pdf_ingestor.export()
+        for content_hash, text in state["texts"].items():
+            yield {"type": "pdf_text", "content_hash": content_hash, "text": text}
+        for block_id, edited, content_hash in state["files"]:
+            yield {"type": "pdf_file", "block_id": block_id, "last_edited_time": edited, "content_hash": content_hash}
+    index = tips_snapshot.export_index()
+    if index is not None:
+        yield dict(index, type="tips_index")
+
+
+def write_snapshot(path, tips_snapshot, scene_snapshot, pdf_ingestor=None, compress=True):
+    """
+    Write a snapshot file atomically. Returns the number of bytes written.
+    """
+    compressor = zlib.compressobj(6) if compress else None
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        for record in snapshot_records(tips_snapshot, scene_snapshot, pdf_ingestor):
+            line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+            f.write(compressor.compress(line) if compressor else line)
+        if compressor:
+            f.write(compressor.flush())
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+def read_records(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(b"{"):
+        data = zlib.decompress(data)
+    for line in data.splitlines():
+        if line:
+            yield json.loads(line)
+
+
+def read_snapshot(path):
+    """
+    Parse a snapshot file into its parts. Raises ValueError for unknown formats or versions.
+    """
+    records = read_records(path)
+    header = next(records, None)
+    if not header or header.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"{path} is not a knowledge snapshot")
+    if header.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported knowledge snapshot version {header.get('version')}")
+
+    snapshot = {
+        "header": header,
+        "tips": {"page_order": [], "pages": {}},
+        "scenes": {"pages": []},
+        "pdfs": {"files": [], "texts": {}},
+        "tips_index": None,
+    }
+    for record in records:
+        kind = record.pop("type")
+        if kind == "tips_page":
+            page_id = record.pop("page_id")
+            snapshot["tips"]["page_order"].append(page_id)
+            snapshot["tips"]["pages"][page_id] = record
+        elif kind == "scene":
+            snapshot["scenes"]["pages"].append(record["page"])
+        elif kind == "pdf_text":
+            snapshot["pdfs"]["texts"][record["content_hash"]] = record["text"]
+        elif kind == "pdf_file":
+            snapshot["pdfs"]["files"].append([record["block_id"], record["last_edited_time"], record["content_hash"]])
+        elif kind == "tips_index":
+            snapshot["tips_index"] = record
+    return snapshot
+
+
+def load_snapshot(path, tips_snapshot, scene_snapshot, pdf_ingestor=None):
+    """
+    Boot the in-memory snapshots from a snapshot file. State that is older than
+    what we already have (e.g. from the SQLite mirror) is ignored, and anything
+    built for different databases is skipped. Returns True if the file was read.
+    """
+    start = time.monotonic()
+    try:
+        snapshot = read_snapshot(path)
+    except (OSError, ValueError, zlib.error) as e:
+        print(f"⚠️ Warning: Could not load knowledge snapshot {path}: {e}")
+        return False
+
+    header = snapshot["header"]
+    if pdf_ingestor is not None:
+        pdf_ingestor.restore(snapshot["pdfs"])
+    if header.get("tips_database_id") == tips_snapshot.database_id and header.get("tips_synced_at"):
+        if tips_snapshot.restore(snapshot["tips"], header["tips_synced_at"]) and snapshot["tips_index"]:
+            tips_snapshot.restore_index(snapshot["tips_index"])
+    if header.get("scene_database_id") == scene_snapshot.database_id and header.get("scenes_synced_at"):
+        scene_snapshot.restore(snapshot["scenes"], header["scenes_synced_at"])
+
+    print(f"✅ Loaded knowledge snapshot {path} in {(time.monotonic() - start) * 1000:.0f} ms "
+          f"({len(snapshot['tips']['page_order'])} tips pages, {len(snapshot['scenes']['pages'])} scenes)")
+    return True
+
+
+def build(path, compress=True):
+    from dotenv import load_dotenv
+
+    from knowledge import PdfIngestor, SceneSnapshot, TipsSnapshot
+    from notion_api import NotionClient
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+    notion = NotionClient(os.environ['NOTION_TOKEN'])
+    pdf_ingestor = PdfIngestor()
+    tips_snapshot = TipsSnapshot(notion, os.environ['NOTION_DATABASE_ID'], pdf_ingestor=pdf_ingestor)
+    scene_snapshot = SceneSnapshot(notion, os.environ['NOTION_DATABASE_ID_SCENE'])
+
+    start = time.monotonic()
+    tips_snapshot.warm()
+    scene_snapshot.sync()
+    size = write_snapshot(path, tips_snapshot, scene_snapshot, pdf_ingestor, compress)
+    print(f"✅ Wrote {path} ({size / 1024:.1f} KiB) in {time.monotonic() - start:.1f}s")
+
+
+def inspect(path):
+    start = time.monotonic()
+    snapshot = read_snapshot(path)
+    elapsed = time.monotonic() - start
+    print(json.dumps(snapshot["header"], indent=2))
+    print(f"tips pages: {len(snapshot['tips']['page_order'])}")
+    print(f"scenes:     {len(snapshot['scenes']['pages'])}")
+    print(f"pdf texts:  {len(snapshot['pdfs']['texts'])}")
+    print(f"tips index: {snapshot['tips_index']['kind'] if snapshot['tips_index'] else 'none'}")
+    print(f"parsed in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="build a snapshot file from Notion")
+    build_parser.add_argument("path")
+    build_parser.add_argument("--no-compress", action="store_true")
+    inspect_parser = commands.add_parser("inspect", help="print a summary of a snapshot file")
+    inspect_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args.path, compress=not args.no_compress)
+    else:
+        inspect(args.path)
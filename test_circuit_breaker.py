@@ -0,0 +1,99 @@
+import time
+
+import httpx
+import pytest
+
+import knowledge
+import notion_api
+from bench_notion import FakeNotion
+
+
+def test_breaker_fails_fast_then_probes_and_closes():
+    with FakeNotion(pages=1, latency=0) as fake:
+        breaker = notion_api.CircuitBreaker(failure_threshold=3, reset_timeout=0.2)
+        client = fake.client(breaker=breaker)
+        fake.failing = True
+        for _ in range(3):
+            assert client.request("GET", "/pages/page-0").status_code == 503
+        assert breaker.state == notion_api.OPEN
+
+        sent = fake.requests
+        with pytest.raises(notion_api.NotionUnavailable):
+            client.request("GET", "/pages/page-0")
+        assert fake.requests == sent
+
+        # After the reset timeout a single probe goes through; a failed probe reopens the circuit
+        time.sleep(0.25)
+        assert client.request("GET", "/pages/page-0").status_code == 503
+        assert breaker.state == notion_api.OPEN
+
+        fake.failing = False
+        time.sleep(0.25)
+        assert client.retrieve_page("page-0")["id"] == "page-0"
+        assert breaker.state == notion_api.CLOSED
+        assert breaker.metrics()["probes"] == 2
+
+
+def test_probe_that_errors_mid_response_reopens_the_circuit():
+    with FakeNotion(pages=1, latency=0) as fake:
+        breaker = notion_api.CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        client = fake.client(breaker=breaker)
+        fake.failing = True
+        client.request("GET", "/pages/page-0")
+        assert breaker.state == notion_api.OPEN
+
+        real = client._http
+        client._http = httpx.Client(transport=httpx.MockTransport(_undecodable), base_url=fake.url)
+        time.sleep(0.15)
+        with pytest.raises(httpx.DecodingError):
+            client.request("GET", "/pages/page-0")
+        assert breaker.state == notion_api.OPEN
+        assert not breaker.metrics()["probe_in_flight"]
+
+        # The next probe still goes through once the reset timeout passes again
+        client._http = real
+        fake.failing = False
+        time.sleep(0.15)
+        assert client.retrieve_page("page-0")["id"] == "page-0"
+        assert breaker.state == notion_api.CLOSED
+
+
+def test_half_open_rejection_says_a_probe_is_in_flight():
+    breaker = notion_api.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    breaker.allow()
+    assert breaker.metrics()["probe_in_flight"]
+    with pytest.raises(notion_api.NotionUnavailable, match="waiting on the probe"):
+        breaker.allow()
+    breaker.release_probe()
+    breaker.allow()
+
+
+def _undecodable(request):
+    raise httpx.DecodingError("bad gzip", request=request)
+
+
+def test_snapshot_serves_last_known_good_while_notion_is_down():
+    with FakeNotion(pages=2, latency=0) as fake:
+        breaker = notion_api.CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        policy = knowledge.TtlPolicy("acting_tips", soft_ttl=0, hard_ttl=0)
+        snapshot = knowledge.TipsSnapshot(fake.client(breaker=breaker), fake.database_id, policy=policy)
+        snapshot.sync()
+
+        fake.failing = True
+        assert "page-1 tip 0" in [hit.text for hit in snapshot.search_hits("tip", top_k=100)]
+        assert breaker.state == notion_api.OPEN
+
+        # With the circuit open, reads don't reach Notion at all
+        sent = fake.requests
+        assert "page-1 tip 0" in [hit.text for hit in snapshot.search_hits("tip", top_k=100)]
+        assert fake.requests == sent
+        assert policy.metrics(snapshot.age())["reads"]["fallback"] == 2
+
+
+def test_cold_snapshot_still_raises_when_notion_is_down():
+    with FakeNotion(pages=2, latency=0) as fake:
+        fake.failing = True
+        snapshot = knowledge.TipsSnapshot(fake.client(), fake.database_id)
+        with pytest.raises(ValueError):
+            snapshot.search_hits("tip")
@@ -0,0 +1,39 @@
+import time
+
+import knowledge
+from engine import RetrievalEngine, provenance
+
+PROMPT = "Use the following information: {notion_summary}"
+
+
+def make_engine(pages):
+    snapshot = knowledge.TipsSnapshot(None, "tips-db")
+    state = {page_id: {"last_edited_time": "t0", "info": info} for page_id, info in pages.items()}
+    snapshot.restore({"page_order": list(pages), "pages": state}, time.time())
+    return snapshot, RetrievalEngine(snapshot, "gpt-3.5-turbo", PROMPT, 150)
+
+
+def test_retrieval_reports_where_chunks_came_from():
+    _, engine = make_engine({
+        "voice": ["Warm up your voice with humming.", "Breathe from the diaphragm."],
+        "nerves": ["Audition nerves fade when you focus on your objective."],
+    })
+    retrieval = engine.retrieve("How do I calm audition nerves?")
+
+    assert retrieval.chunks[0] == "Audition nerves fade when you focus on your objective."
+    assert provenance(retrieval)[0]["page_id"] == "nerves"
+    assert [hit.text for hit in retrieval.sources] == retrieval.chunks
+    assert engine.system_prompt(retrieval).startswith("Use the following information: Audition nerves")
+
+
+def test_cached_hits_are_dropped_when_the_snapshot_changes():
+    snapshot, engine = make_engine({"voice": ["Warm up your voice with humming."]})
+    assert not engine.retrieve("voice warm up").cached
+    assert engine.retrieve("Warm up voice?").cached
+
+    snapshot.restore({"page_order": ["voice"],
+                      "pages": {"voice": {"last_edited_time": "t1", "info": ["Hum scales to warm up your voice."]}}},
+                     time.time() + 1)
+    retrieval = engine.retrieve("voice warm up")
+    assert not retrieval.cached
+    assert retrieval.chunks == ["Hum scales to warm up your voice."]
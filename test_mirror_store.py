@@ -0,0 +1,90 @@
+import os
+
+from bench_notion import FakeNotion
+from mirror_store import MirrorStore
+
+
+def scene(page_id, title, edited="2024-01-01T00:00:00.000Z"):
+    return {
+        "id": page_id, "created_time": "2024-01-01T00:00:00.000Z", "last_edited_time": edited,
+        "properties": {
+            "Title": {"title": [{"text": {"content": title}}]},
+            "Upload Scene": {"files": [{"type": "external", "external": {"url": f"https://files/{page_id}.pdf"}}]},
+        },
+    }
+
+
+def test_tips_round_trip_rewrites_only_changed_pages(tmp_path):
+    store = MirrorStore(str(tmp_path / "mirror.sqlite3"))
+    pages = {
+        "a": {"last_edited_time": "t1", "info": ["a tip 0", "a tip 1"]},
+        "b": {"last_edited_time": "t1", "info": ["b tip 0"]},
+    }
+    store.save_tips(["b", "a"], pages, ["a", "b"], synced_at=100.0)
+    assert store.load_tips() == (["b", "a"], pages)
+    assert store.synced_at("tips") == 100.0
+
+    # Blocks of pages not listed as changed are kept as they were; removed pages lose theirs
+    edited = {"a": {"last_edited_time": "t2", "info": ["a tip 0 v2"]}}
+    store.save_tips(["a"], edited, [])
+    assert store.load_tips() == (["a"], {"a": {"last_edited_time": "t2", "info": ["a tip 0", "a tip 1"]}})
+    store.save_tips(["a"], edited, ["a"])
+    assert store.load_tips()[1] == edited
+
+
+def test_scenes_round_trip_and_extracted_text(tmp_path):
+    store = MirrorStore(str(tmp_path / "mirror.sqlite3"))
+    scenes = [scene("s1", "Kitchen argument"), scene("s2", "Rooftop goodbye")]
+    store.save_scenes(scenes)
+    assert store.load_scenes() == scenes
+
+    store.save_scene_text("s1", "2024-01-01T00:00:00.000Z", "MARTA: You never listen.")
+    assert store.scene_text("s1", "2024-01-01T00:00:00.000Z") == "MARTA: You never listen."
+    # Text extracted for another version of the scene doesn't count
+    assert store.scene_text("s1", "2024-02-01T00:00:00.000Z") is None
+
+    # Unchanged scenes keep their text across syncs; dropped scenes disappear
+    store.save_scenes([scenes[0]])
+    assert store.load_scenes() == [scenes[0]]
+    assert store.scene_text("s1", "2024-01-01T00:00:00.000Z") == "MARTA: You never listen."
+
+
+def test_scene_search_follows_titles_and_text(tmp_path):
+    store = MirrorStore(str(tmp_path / "mirror.sqlite3"))
+    store.save_scenes([scene("s1", "Kitchen argument"), scene("s2", "Rooftop goodbye")])
+    store.save_scene_text("s2", "2024-01-01T00:00:00.000Z", "JO: I kept the kitchen keys.")
+
+    assert store.search_scenes("rooftop") == [{"id": "s2", "title": "Rooftop goodbye"}]
+    assert {hit["id"] for hit in store.search_scenes("kitchen?")} == {"s1", "s2"}
+    assert store.search_scenes("!!") == []
+
+    store.save_scenes([scene("s1", "Garden argument", edited="t2")])
+    assert store.search_scenes("kitchen") == []
+    assert store.search_scenes("garden") == [{"id": "s1", "title": "Garden argument"}]
+
+
+def test_unchanged_scene_sync_leaves_rows_alone(tmp_path):
+    with FakeNotion(pages=0, latency=0, scenes=50) as fake:
+        store = MirrorStore(str(tmp_path / "mirror.sqlite3"))
+        scenes = list(fake.client().iter_database(fake.scene_database_id))
+        store.save_scenes(scenes)
+
+        db = store._connect().db
+        before = db.total_changes
+        store.save_scenes(scenes)
+        # Only the sync_state row is written
+        assert db.total_changes - before == 1
+        assert len(store.search_scenes("scene")) == 10
+
+
+def test_forked_worker_opens_its_own_connection(tmp_path):
+    store = MirrorStore(str(tmp_path / "mirror.sqlite3"))
+    parent = store._connect().db
+    pid = os.fork()
+    if pid == 0:
+        store.save_scenes([scene("s1", "Kitchen fight")])
+        os._exit(0 if store._connect().db is not parent else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert store._connect().db is parent
+    assert store.search_scenes("kitchen") == [{"id": "s1", "title": "Kitchen fight"}]
@@ -0,0 +1,54 @@
+import knowledge
+from bench_notion import FakeNotion
+
+
+def test_sync_keeps_children_requests_within_the_concurrency_limit():
+    with FakeNotion(pages=6, latency=0.05, paragraphs=3, tree_depth=2) as fake:
+        snapshot = knowledge.TipsSnapshot(fake.client(), fake.database_id, concurrency=3)
+        snapshot.sync()
+
+        # 6 pages, each with 3 toggles of 3 toggles of 3 paragraphs
+        assert sum(len(page["info"]) for page in snapshot.export()["pages"].values()) == 6 * (3 + 9 + 27)
+        assert fake.counts["children"] == 6 * (1 + 3 + 9)
+        assert fake.peak_in_flight <= 3
+
+
+def test_block_tree_stops_at_max_blocks():
+    with FakeNotion(pages=1, latency=0, paragraphs=5, tree_depth=1) as fake:
+        info = knowledge.walk_block_tree(fake.client(), "page-0", max_blocks=3)
+        assert info == ["page-0 tip 0", "page-0 tip 1", "page-0 tip 2"]
+
+        info = knowledge.walk_block_tree(fake.client(), "page-0", max_blocks=8)
+        assert len(info) == 8
+        assert info[:2] == ["page-0 tip 0", "page-0.0 tip 0"]
+
+
+def test_pagination_follows_cursors_and_stops_at_limit():
+    with FakeNotion(pages=0, latency=0, scenes=250) as fake:
+        client = fake.client()
+        scenes = list(client.iter_database(fake.scene_database_id))
+        assert [scene["id"] for scene in scenes] == [f"scene-{i}" for i in range(250)]
+        assert fake.calls == [("query", 100)] * 3
+
+        # The last request shrinks to what is still needed
+        fake.calls.clear()
+        assert len(list(client.iter_database(fake.scene_database_id, page_size=50, limit=120))) == 120
+        assert fake.calls == [("query", 50), ("query", 50), ("query", 20)]
+
+        # Stopping early never fetches the next page
+        fake.calls.clear()
+        rows = client.iter_database(fake.scene_database_id)
+        assert next(rows)["id"] == "scene-0"
+        rows.close()
+        assert fake.calls == [("query", 100)]
+
+
+def test_sync_walks_pages_while_later_results_arrive():
+    with FakeNotion(pages=150, latency=0.02, paragraphs=1) as fake:
+        snapshot = knowledge.TipsSnapshot(fake.client(), fake.database_id, concurrency=4)
+        snapshot.sync()
+
+        assert len(snapshot.export()["page_order"]) == 150
+        kinds = [kind for kind, _ in fake.calls]
+        assert kinds.count("query") == 2
+        assert kinds.index("children") < kinds.index("query", 1)
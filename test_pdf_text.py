@@ -0,0 +1,179 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+import requests
+
+import knowledge
+import pdf_text
+from bench_pdf import FileServer, sample_pdf
+from mirror_store import MirrorStore
+from pdf_text import BufferStream, extract_text_from_bytes
+
+
+def test_memoryview_and_bytes_extract_the_same_text():
+    data = sample_pdf(3, lines_per_page=5)
+    text = extract_text_from_bytes(data)
+    assert "p2 l4 INT. REHEARSAL ROOM" in text
+    assert extract_text_from_bytes(memoryview(bytearray(data))) == text
+
+
+def test_buffer_stream_reads_and_seeks():
+    stream = BufferStream(bytearray(b"%PDF-1.4 body %%EOF"))
+    assert stream.read(4) == b"%PDF"
+    stream.seek(-5, 2)
+    assert stream.read() == b"%%EOF"
+    stream.seek(9)
+    buffer = bytearray(4)
+    assert stream.readinto(buffer) == 4 and bytes(buffer) == b"body"
+
+
+def test_concurrent_extractions_do_not_mix_files():
+    documents = {f"doc{i}-": sample_pdf(4, lines_per_page=10, tag=f"doc{i}-") for i in range(16)}
+    barrier = threading.Barrier(len(documents))
+    results = {}
+    errors = []
+
+    def extract(tag, data):
+        barrier.wait()
+        try:
+            results[tag] = extract_text_from_bytes(memoryview(data))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=extract, args=item) for item in documents.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    for tag, text in results.items():
+        lines = text.splitlines()
+        assert len(lines) == 40
+        assert all(line.startswith(tag) for line in lines)
+
+
+def test_page_parallel_extraction_keeps_page_order():
+    data = sample_pdf(9, lines_per_page=3)
+    serial = extract_text_from_bytes(data, processes=1)
+    assert extract_text_from_bytes(memoryview(bytearray(data)), processes=2, min_pages=5) == serial
+    assert 2 in pdf_text._pools
+
+    # Short files never reach the pool
+    pdf_text._pools.pop(3, None)
+    assert extract_text_from_bytes(data, processes=3, min_pages=10) == serial
+    assert 3 not in pdf_text._pools
+
+
+def run_app_script(script):
+    env = dict(os.environ, RENDER="true", OPENAI_API_KEY="x", NOTION_TOKEN="x", NOTION_DATABASE_ID="tips",
+               NOTION_DATABASE_ID_SCENE="scenes", AWS_ACCESS_KEY_ID="x", AWS_SECRET_ACCESS_KEY="x",
+               S3_BUCKET_NAME="bucket", AWS_DEFAULT_REGION="us-east-1", NOTION_MIRROR_PATH="", TEXT_CACHE_DIR="")
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_pool_workers_do_not_start_the_app():
+    # What a spawned extraction worker does first when the app runs as `python app.py`
+    stdout = run_app_script(
+        "import multiprocessing.spawn, sys, threading\n"
+        "multiprocessing.spawn.import_main_path('app.py')\n"
+        "app = sys.modules['__main__']\n"
+        "print('background', app._background_pid, [t.name for t in threading.enumerate()])\n"
+    )
+    assert "background None ['MainThread']" in stdout
+    assert "S3 Buckets" not in stdout
+
+
+def test_importing_the_app_starts_no_threads():
+    # What a `gunicorn --preload` master does before forking its workers
+    stdout = run_app_script(
+        "import threading\n"
+        "import app\n"
+        "print('background', app._background_pid, [t.name for t in threading.enumerate()])\n"
+    )
+    assert "background None ['MainThread']" in stdout
+
+
+def test_streaming_download_limits():
+    pdf = sample_pdf(5)
+    routes = {
+        "/scene.pdf": (pdf, {"Content-Length": str(len(pdf))}, 0),
+        "/no-length.pdf": (pdf, {}, 0),
+        "/page.html": (b"<html>" + b"x" * 5000, {}, 0),
+        "/slow.pdf": (pdf, {}, 0.05),
+        "/trickle.pdf": (sample_pdf(60), {}, 0.1),
+    }
+    with FileServer(routes) as server:
+        data = pdf_text.download_pdf(f"{server.url}/scene.pdf")
+        assert isinstance(data, memoryview) and data == pdf
+        assert pdf_text.download_pdf(f"{server.url}/no-length.pdf") == pdf
+
+        with pytest.raises(pdf_text.PdfDownloadError, match="not a PDF"):
+            pdf_text.download_pdf(f"{server.url}/page.html")
+        with pytest.raises(pdf_text.PdfDownloadError, match="byte limit"):
+            pdf_text.download_pdf(f"{server.url}/scene.pdf", max_bytes=len(pdf) - 1)
+        with pytest.raises(pdf_text.PdfDownloadError, match="byte limit"):
+            pdf_text.download_pdf(f"{server.url}/no-length.pdf", max_bytes=len(pdf) - 1)
+        with pytest.raises(pdf_text.PdfDownloadError, match="took over"):
+            pdf_text.download_pdf(f"{server.url}/slow.pdf", deadline=0.1)
+        # The deadline is checked on every read, not only after each full 64 KiB chunk
+        started = time.monotonic()
+        with pytest.raises(pdf_text.PdfDownloadError, match="took over"):
+            pdf_text.download_pdf(f"{server.url}/trickle.pdf", deadline=0.3)
+        assert time.monotonic() - started < 1
+        # Refused downloads raise a RequestException, so callers handle them like other download errors
+        with pytest.raises(requests.exceptions.RequestException):
+            extract_text_from_bytes(pdf_text.download_pdf(f"{server.url}/page.html"))
+
+
+def pdf_block(block_id, url, edited="2024-01-01T00:00:00.000Z", name="handout.pdf"):
+    return {"id": block_id, "type": "file", "last_edited_time": edited,
+            "file": {"type": "external", "external": {"url": url}, "name": name}}
+
+
+def test_pdf_ingestor_downloads_each_block_version_once(tmp_path, monkeypatch):
+    extractions = []
+
+    def counting_extract(data):
+        extractions.append(len(data))
+        return extract_text_from_bytes(data)
+
+    monkeypatch.setattr(knowledge, "extract_text_from_bytes", counting_extract)
+    handout = sample_pdf(2, lines_per_page=3, tag="handout-")
+    revised = sample_pdf(1, lines_per_page=3, tag="revised-")
+    routes = {"/a.pdf": (handout, {}, 0), "/b.pdf": (handout, {}, 0), "/revised.pdf": (revised, {}, 0)}
+    with FileServer(routes) as server:
+        store = MirrorStore(str(tmp_path / "mirror.sqlite3"))
+        ingestor = knowledge.PdfIngestor(store=store, chunk_chars=200)
+        block = pdf_block("block-a", f"{server.url}/a.pdf")
+
+        chunks = ingestor.chunks_for_block(block)
+        assert chunks[0].startswith("From handout.pdf: handout-p0 l0")
+        assert ingestor.chunks_for_block(block) == chunks
+        assert server.hits["/a.pdf"] == 1
+
+        # The same handout attached to another block is downloaded but not parsed again
+        assert ingestor.chunks_for_block(pdf_block("block-b", f"{server.url}/b.pdf")) == chunks
+        assert len(extractions) == 1
+
+        # Editing the block (e.g. replacing the file) fetches the new version
+        edited = pdf_block("block-a", f"{server.url}/revised.pdf", edited="2024-02-01T00:00:00.000Z")
+        assert "revised-p0 l0" in ingestor.text_for_block(edited)
+        assert len(extractions) == 2
+
+        # Another worker sharing the mirror needs neither download nor parse
+        other = knowledge.PdfIngestor(store=MirrorStore(store.path), chunk_chars=200)
+        assert other.chunks_for_block(pdf_block("block-b", f"{server.url}/b.pdf")) == chunks
+        assert "revised-p0 l0" in other.text_for_block(edited)
+        assert server.hits == {"/a.pdf": 1, "/b.pdf": 1, "/revised.pdf": 1}
+        assert len(extractions) == 2
+
+        # Blocks that aren't PDFs are left alone
+        assert ingestor.chunks_for_block(pdf_block("image", f"{server.url}/a.png", name="still.png")) == []
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+
+import knowledge
+from bench_notion import FakeNotion
+from mirror_store import MirrorStore
+from retrieval import BM25Index, TfidfIndex, pack_context, packing_metrics
+
+
+def tips_state(page_count, version=0):
+    page_order = [f"page-{i}" for i in range(page_count)]
+    pages = {
+        page_id: {"last_edited_time": f"v{version}",
+                  "info": [f"{page_id} breath {n} objective beat" for n in range(3)]}
+        for page_id in page_order
+    }
+    return page_order, pages
+
+
+def test_bm25_sync_reindexes_only_changed_pages():
+    index = BM25Index()
+    page_order, pages = tips_state(3)
+    assert index.sync(page_order, pages) == 3
+    assert index.sync(page_order, pages) == 0
+
+    # A sync hands over new chunk lists only for edited pages
+    pages = dict(pages, **{"page-1": {"last_edited_time": "v1", "info": ["page-1 stage combat safety"]}})
+    assert index.sync(page_order, pages) == 1
+    assert [hit.page_id for hit in index.hits("combat", 5)] == ["page-1"]
+    assert index.hits("page-1 breath", 5)[0].page_id != "page-1"
+
+    del pages["page-0"]
+    assert index.sync(page_order[1:], pages) == 0
+    assert len(index) == 1 + 3
+    assert all(hit.page_id != "page-0" for hit in index.hits("breath objective", 10))
+
+
+def test_snapshot_edit_reindexes_one_page():
+    with FakeNotion(pages=4, latency=0) as fake:
+        index = BM25Index()
+        snapshot = knowledge.TipsSnapshot(fake.client(), fake.database_id, index=index)
+        snapshot.warm()
+
+        fake.edit("page-2")
+        snapshot.sync()
+        page_order, pages = snapshot.export()["page_order"], snapshot.export()["pages"]
+        assert index.sync(page_order, pages) == 1
+        assert snapshot.search_hits("page-2 tip 0 v1", 1)[0].text == "page-2 tip 0 v1"
+
+
+def test_reload_from_the_mirror_reindexes_only_changed_pages(tmp_path):
+    with FakeNotion(pages=4, latency=0) as fake:
+        path = str(tmp_path / "mirror.sqlite3")
+        syncer = knowledge.TipsSnapshot(fake.client(), fake.database_id, store=MirrorStore(path))
+        index = BM25Index()
+        reader = knowledge.TipsSnapshot(fake.client(), fake.database_id, store=MirrorStore(path), index=index)
+        syncer.sync()
+        reader.warm()
+        state = reader.export()
+
+        # Another worker syncs with nothing changed: the reload keeps our state as is
+        time.sleep(0.01)
+        syncer.sync()
+        reader._load_from_store()
+        assert reader.export()["pages"] is state["pages"]
+
+        fake.edit("page-2")
+        syncer.sync()
+        reader._load_from_store()
+        page_order, pages = reader.export()["page_order"], reader.export()["pages"]
+        assert index.sync(page_order, pages) == 1
+
+
+def test_tfidf_index_is_memory_mapped_by_other_workers(tmp_path):
+    directory = str(tmp_path)
+    page_order, pages = tips_state(4)
+    writer = TfidfIndex(directory)
+    writer.sync(page_order, pages)
+
+    reader = TfidfIndex(directory)
+    assert reader.sync(page_order, pages) == 0
+    assert reader.hits("page-2 objective", 3) == writer.hits("page-2 objective", 3)
+
+    # Old builds are pruned once newer ones are published
+    for version in range(1, 6):
+        writer.sync(*tips_state(4, version))
+    assert len(os.listdir(tmp_path / "builds")) == TfidfIndex.KEEP_BUILDS
+
+
+def test_tfidf_load_never_mixes_two_builds(tmp_path):
+    directory = str(tmp_path)
+    small, large = tips_state(2), tips_state(40)
+    TfidfIndex(directory).sync(*small)
+    stop = threading.Event()
+
+    def keep_saving():
+        writer = TfidfIndex(directory)
+        version = 0
+        while not stop.is_set():
+            version += 1
+            page_order, pages = large if version % 2 else small
+            writer.build(page_order, {page_id: dict(page, last_edited_time=f"v{version}")
+                                      for page_id, page in pages.items()})
+
+    thread = threading.Thread(target=keep_saving)
+    thread.start()
+    try:
+        for _ in range(200):
+            reader = TfidfIndex()
+            reader.directory = directory
+            assert reader.load(attempts=10)
+            assert len(reader.indptr) == len(reader) + 1
+            assert len(reader.data) == len(reader.rows) == reader.indptr[-1]
+            assert reader.rows.max() < len(reader)
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_pack_context_skips_chunks_that_do_not_fit_quietly(capsys):
+    chunks = ["short tip " * 5, "long handout " * 400, "another short tip " * 5]
+    packed = pack_context(chunks, "gpt-3.5-turbo", "Question?", max_tokens=150, budget=200)
+
+    assert packed.chunks == [chunks[0], chunks[2]]
+    assert packed.dropped == 1
+    assert capsys.readouterr().out == ""
+    assert packing_metrics()["token_counter"] in ("tiktoken", "estimate")
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import knowledge
+from bench_notion import FakeNotion
+
+
+def run_concurrently(count, fn):
+    """
+    Start `count` threads that call `fn` at the same moment and collect their results.
+    """
+    barrier = threading.Barrier(count)
+    results = [None] * count
+    errors = []
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_single_flight_shares_one_call():
+    flight = knowledge.SingleFlight()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return "tips"
+
+    results, errors = run_concurrently(20, lambda: flight.do(("database", "tips"), slow_fetch))
+    assert not errors
+    assert results == ["tips"] * 20
+    assert len(calls) == 1
+
+
+def test_single_flight_shares_errors():
+    flight = knowledge.SingleFlight()
+
+    def failing_fetch():
+        time.sleep(0.1)
+        raise ValueError("Notion API error")
+
+    results, errors = run_concurrently(10, lambda: flight.do("page", failing_fetch))
+    assert len(errors) == 10
+    assert all(str(e) == "Notion API error" for e in errors)
+    # The failed call is forgotten, so the next miss tries again
+    assert flight.do("page", lambda: "ok") == "ok"
+
+
+def test_cold_tips_cache_crawls_once_for_50_concurrent_questions():
+    with FakeNotion(pages=5, latency=0.05) as fake:
+        snapshot = knowledge.TipsSnapshot(fake.client(), "tips-db")
+        results, errors = run_concurrently(50, lambda: [hit.text for hit in snapshot.search_hits("tip 3")])
+
+        assert not errors
+        assert all(result == results[0] for result in results)
+        assert fake.counts["query"] == 1
+        assert fake.counts["children"] == 5
+
+
+def test_snapshots_of_the_same_database_id_do_not_share_syncs():
+    # e.g. two workspaces (or a test double) behind different clients
+    with FakeNotion(pages=2, latency=0.05) as first, FakeNotion(pages=3, latency=0.05) as second:
+        snapshots = [knowledge.TipsSnapshot(first.client(), "tips-db"),
+                     knowledge.TipsSnapshot(second.client(), "tips-db")]
+        results, errors = run_concurrently(2, lambda: snapshots.pop().search_hits("tip 0"))
+
+        assert not errors
+        assert first.counts["query"] == second.counts["query"] == 1
+        assert first.counts["children"] == 2 and second.counts["children"] == 3
+
+
+if __name__ == "__main__":
+    test_single_flight_shares_one_call()
+    test_single_flight_shares_errors()
+    test_cold_tips_cache_crawls_once_for_50_concurrent_questions()
+    test_snapshots_of_the_same_database_id_do_not_share_syncs()
+    print("✅ Single-flight tests passed")
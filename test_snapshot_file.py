@@ -0,0 +1,75 @@
+import zlib
+
+import pytest
+
+import knowledge
+import snapshot_file
+from bench_notion import FakeNotion
+from retrieval import TfidfIndex
+
+
+def synced_snapshots(fake, **tips_kwargs):
+    pdf_ingestor = knowledge.PdfIngestor()
+    pdf_ingestor._remember(("block-1", "t1"), "hash-1", "Handout text about breath.")
+    tips = knowledge.TipsSnapshot(fake.client(), fake.database_id, pdf_ingestor=pdf_ingestor, **tips_kwargs)
+    scenes = knowledge.SceneSnapshot(fake.client(), fake.scene_database_id)
+    tips.warm()
+    scenes.sync()
+    return tips, scenes, pdf_ingestor
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_snapshot_round_trip(tmp_path, compress):
+    path = str(tmp_path / "knowledge.snapshot")
+    with FakeNotion(pages=3, latency=0, scenes=4) as fake:
+        tips, scenes, pdf_ingestor = synced_snapshots(fake, index=TfidfIndex())
+        snapshot_file.write_snapshot(path, tips, scenes, pdf_ingestor, compress=compress)
+        with open(path, "rb") as f:
+            assert (f.read(1) == b"{") != compress
+
+        fake.counts.clear()
+        index = TfidfIndex()
+        booted_ingestor = knowledge.PdfIngestor()
+        booted_tips = knowledge.TipsSnapshot(fake.client(), fake.database_id, index=index)
+        booted_scenes = knowledge.SceneSnapshot(fake.client(), fake.scene_database_id)
+        assert snapshot_file.load_snapshot(path, booted_tips, booted_scenes, booted_ingestor)
+
+        assert booted_tips.export() == tips.export()
+        assert booted_scenes.export() == scenes.export()
+        assert booted_ingestor.export() == pdf_ingestor.export()
+        # The prebuilt index matches the restored state, so the first question doesn't rebuild it
+        state = booted_tips.export()
+        assert index.sync(state["page_order"], state["pages"]) == 0
+        assert booted_tips.search_hits("page-1 tip 2", 1)[0].text == "page-1 tip 2"
+        assert sum(fake.counts.values()) == 0
+
+
+def test_snapshot_for_other_databases_or_older_state_is_skipped(tmp_path):
+    path = str(tmp_path / "knowledge.snapshot")
+    with FakeNotion(pages=2, latency=0, scenes=2) as fake:
+        tips, scenes, _ = synced_snapshots(fake)
+        snapshot_file.write_snapshot(path, tips, scenes)
+
+        other_tips = knowledge.TipsSnapshot(fake.client(), "another-tips-db")
+        other_scenes = knowledge.SceneSnapshot(fake.client(), "another-scene-db")
+        assert snapshot_file.load_snapshot(path, other_tips, other_scenes)
+        assert other_tips.export()["page_order"] == [] and other_scenes.export()["pages"] == []
+
+        # A worker that synced after the snapshot was baked keeps its own state
+        fake.edit("page-0")
+        newer_tips, newer_scenes, _ = synced_snapshots(fake)
+        assert snapshot_file.load_snapshot(path, newer_tips, newer_scenes)
+        assert "page-0 tip 0 v1" in newer_tips.export()["pages"]["page-0"]["info"]
+
+
+def test_unreadable_snapshots_are_reported_not_raised(tmp_path):
+    with FakeNotion(pages=0, latency=0) as fake:
+        tips = knowledge.TipsSnapshot(fake.client(), fake.database_id)
+        scenes = knowledge.SceneSnapshot(fake.client(), fake.scene_database_id)
+
+        garbage = tmp_path / "garbage.snapshot"
+        garbage.write_bytes(zlib.compress(b'{"format": "something-else"}\n'))
+        assert not snapshot_file.load_snapshot(str(garbage), tips, scenes)
+        assert not snapshot_file.load_snapshot(str(tmp_path / "missing.snapshot"), tips, scenes)
+        with pytest.raises(ValueError):
+            snapshot_file.read_snapshot(str(garbage))
@@ -0,0 +1,92 @@
+import threading
+import time
+
+from bench_pdf import FileServer, sample_pdf
+from text_cache import TextCache, content_hash, source_key
+
+
+def test_repeat_extraction_skips_download_and_parse(tmp_path):
+    pdf = sample_pdf(2, lines_per_page=3)
+    with FileServer({"/workspace/abc/scene.pdf": (pdf, {}, 0)}) as server:
+        cache = TextCache(str(tmp_path))
+        text = cache.extract(f"{server.url}/workspace/abc/scene.pdf?X-Amz-Signature=one")
+        assert "p1 l2 INT. REHEARSAL ROOM" in text
+
+        # Same file behind a freshly signed URL
+        assert cache.extract(f"{server.url}/workspace/abc/scene.pdf?X-Amz-Signature=two") == text
+        assert server.hits["/workspace/abc/scene.pdf"] == 1
+
+        # Another worker sharing the disk tier doesn't download or parse either
+        other = TextCache(str(tmp_path))
+        assert other.extract(f"{server.url}/workspace/abc/scene.pdf?X-Amz-Signature=three") == text
+        assert server.hits["/workspace/abc/scene.pdf"] == 1
+        assert other.metrics()["disk_hits"] == 1
+        assert other.metrics()["extractions"] == 0
+
+
+def test_same_content_under_another_name_is_parsed_once(tmp_path):
+    pdf = sample_pdf(1, lines_per_page=3)
+    with FileServer({"/a.pdf": (pdf, {}, 0), "/b.pdf": (pdf, {}, 0)}) as server:
+        cache = TextCache(str(tmp_path))
+        assert cache.extract(f"{server.url}/a.pdf") == cache.extract(f"{server.url}/b.pdf")
+        assert cache.metrics()["downloads"] == 2
+        assert cache.metrics()["extractions"] == 1
+
+
+def test_reupload_under_the_same_s3_key_is_not_served_stale():
+    url = "https://scenes.s3.us-east-1.amazonaws.com/My%20Scene.pdf"
+    key = source_key(url, "scenes")
+    assert key == "s3:scenes/My Scene.pdf"
+
+    cache = TextCache("")
+    cache.put_text("old-hash", "old text")
+    cache.set_source(key, "old-hash")
+    assert cache.text_for_source(key) == "old text"
+
+    cache.set_source(key, "new-hash")
+    assert cache.text_for_source(key) is None
+
+
+def test_sidecar_skips_download_unless_it_is_stale():
+    pdf = sample_pdf(1, lines_per_page=3)
+    sidecars = {"url:127.0.0.1/scene.pdf": ("sidecar-hash", "text from the sidecar")}
+    with FileServer({"/scene.pdf": (pdf, {}, 0)}) as server:
+        cache = TextCache("", fetch_sidecar=sidecars.get)
+        assert cache.extract(f"{server.url}/scene.pdf") == "text from the sidecar"
+        assert server.hits["/scene.pdf"] == 0
+
+        # The file was replaced after the sidecar was written
+        fresh = TextCache("", fetch_sidecar=sidecars.get)
+        fresh.set_source("url:127.0.0.1/scene.pdf", "new-upload-hash")
+        assert "p0 l2" in fresh.extract(f"{server.url}/scene.pdf")
+        assert server.hits["/scene.pdf"] == 1
+
+
+def test_ingest_at_upload_time_means_no_download_later():
+    pdf = sample_pdf(1, lines_per_page=3)
+    with FileServer({"/scene.pdf": (pdf, {}, 0)}) as server:
+        cache = TextCache("")
+        key = source_key(f"{server.url}/scene.pdf")
+        digest, text = cache.ingest(key, pdf)
+        assert cache.extract(f"{server.url}/scene.pdf") == text
+        assert server.hits["/scene.pdf"] == 0
+
+
+def test_reupload_during_a_slow_download_keeps_the_new_text():
+    old_pdf = sample_pdf(1, lines_per_page=3, tag="old-")
+    new_pdf = sample_pdf(1, lines_per_page=3, tag="new-")
+    with FileServer({"/scene.pdf": (old_pdf, {}, 0.5)}) as server:
+        cache = TextCache("")
+        url = f"{server.url}/scene.pdf"
+        key = source_key(url)
+        reader = threading.Thread(target=cache.extract, args=(url,))
+        reader.start()
+        while not server.hits["/scene.pdf"]:
+            time.sleep(0.01)
+
+        # The upload handler repoints the key, then ingests the new bytes
+        cache.set_source(key, content_hash(new_pdf))
+        digest, text = cache.ingest(key, new_pdf)
+        assert digest == content_hash(new_pdf) and "new-p0" in text
+        reader.join()
+        assert cache.text_for_source(key) == text
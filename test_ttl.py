@@ -0,0 +1,58 @@
+import time
+
+import knowledge
+from bench_notion import FakeNotion
+
+
+def timed_search(snapshot):
+    start = time.perf_counter()
+    result = [hit.text for hit in snapshot.search_hits("tip", top_k=100)]
+    return result, time.perf_counter() - start
+
+
+def test_soft_ttl_serves_stale_state_and_revalidates_in_background():
+    with FakeNotion(pages=2, latency=0.2) as fake:
+        policy = knowledge.TtlPolicy("acting_tips", soft_ttl=0.05, hard_ttl=60)
+        snapshot = knowledge.TipsSnapshot(fake.client(), fake.database_id, policy=policy)
+        snapshot.sync()
+        fake.edit("page-0")
+        time.sleep(0.1)
+
+        stale, elapsed = timed_search(snapshot)
+        assert elapsed < 0.1
+        assert "page-0 tip 0" in stale
+
+        # The background sync lands without another reader waiting on it
+        deadline = time.monotonic() + 5
+        while "page-0 tip 0 v1" not in snapshot.export()["pages"]["page-0"]["info"]:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert policy.metrics(snapshot.age())["reads"]["stale"] == 1
+
+
+def test_hard_ttl_blocks_until_synced():
+    with FakeNotion(pages=2, latency=0.1) as fake:
+        policy = knowledge.TtlPolicy("acting_tips", soft_ttl=0.01, hard_ttl=0.05)
+        snapshot = knowledge.TipsSnapshot(fake.client(), fake.database_id, policy=policy)
+        snapshot.sync()
+        fake.edit("page-0")
+        time.sleep(0.1)
+
+        fresh, elapsed = timed_search(snapshot)
+        assert elapsed >= 0.1
+        assert "page-0 tip 0 v1" in fresh
+        assert policy.metrics(snapshot.age())["reads"] == {"fresh": 0, "stale": 0, "blocked": 1, "fallback": 0}
+
+
+def test_latest_scene_has_its_own_ttls():
+    with FakeNotion(pages=0, latency=0, scenes=3) as fake:
+        latest_policy = knowledge.TtlPolicy("latest_scene", soft_ttl=0, hard_ttl=0)
+        snapshot = knowledge.SceneSnapshot(fake.client(), fake.scene_database_id, latest_policy=latest_policy)
+        snapshot.sync()
+        fake.counts.clear()
+
+        snapshot.pages()
+        assert fake.counts["query"] == 0
+        assert snapshot.latest_scene()["id"] == "scene-2"
+        assert fake.counts["query"] == 1
+        assert set(snapshot.metrics()) == {"scene_list", "latest_scene"}
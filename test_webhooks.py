@@ -0,0 +1,143 @@
+import json
+
+import knowledge
+import webhooks
+from bench_notion import FakeNotion
+from mirror_store import MirrorStore
+
+
+def event(kind, page_id, database_id="tips-db"):
+    """
+    A page event shaped like the ones Notion delivers (trimmed to the fields we read).
+    """
+    return {
+        "id": f"evt-{kind}-{page_id}",
+        "timestamp": "2024-01-01T00:00:00.000Z",
+        "type": kind,
+        "entity": {"id": page_id, "type": "page"},
+        "data": {"parent": {"id": database_id, "type": "database"}},
+    }
+
+
+def warm_snapshot(fake, **kwargs):
+    snapshot = knowledge.TipsSnapshot(fake.client(), fake.database_id, **kwargs)
+    snapshot.sync()
+    fake.counts.clear()
+    return snapshot
+
+
+def test_content_update_refetches_only_that_page():
+    with FakeNotion(pages=5, latency=0) as fake:
+        snapshot = warm_snapshot(fake)
+        handler = webhooks.NotionWebhookHandler([snapshot])
+
+        fake.edit("page-2")
+        assert handler.handle(event("page.content_updated", "page-2")) == "refreshed"
+
+        assert fake.counts == {"page": 1, "children": 1}
+        info = [hit.text for hit in snapshot.search_hits("tip", top_k=100)]
+        assert "page-2 tip 0 v1" in info
+        assert "page-3 tip 0" in info
+        # The edit was applied without making the snapshot stale
+        assert fake.counts["query"] == 0
+
+
+def test_created_and_deleted_pages():
+    with FakeNotion(pages=3, latency=0) as fake:
+        snapshot = warm_snapshot(fake)
+        handler = webhooks.NotionWebhookHandler([snapshot])
+
+        fake.pages = 4
+        assert handler.handle(event("page.created", "page-3")) == "refreshed"
+        fake.delete("page-0")
+        assert handler.handle(event("page.deleted", "page-0")) == "removed from 1 snapshot(s)"
+
+        assert snapshot.export()["page_order"] == ["page-1", "page-2", "page-3"]
+        assert fake.counts["query"] == 0
+
+
+def test_events_for_other_databases_are_ignored():
+    with FakeNotion(pages=2, latency=0) as fake:
+        snapshot = warm_snapshot(fake)
+        handler = webhooks.NotionWebhookHandler([snapshot])
+
+        assert handler.handle(event("page.created", "elsewhere", database_id="other-db")) == "ignored"
+        assert handler.handle({"type": "database.schema_updated", "entity": {"id": "tips-db", "type": "database"}}) == "ignored"
+        assert sum(fake.counts.values()) == 0
+
+
+def test_page_moved_out_of_database_is_dropped():
+    with FakeNotion(pages=2, latency=0) as fake:
+        snapshot = warm_snapshot(fake)
+        handler = webhooks.NotionWebhookHandler([snapshot])
+
+        fake.move("page-1", "some-workspace-page")
+        handler.handle(event("page.moved", "page-1", database_id="some-workspace-page"))
+        assert snapshot.export()["page_order"] == ["page-0"]
+
+
+def test_removals_are_confirmed_with_notion():
+    with FakeNotion(pages=2, latency=0) as fake:
+        snapshot = warm_snapshot(fake)
+        handler = webhooks.NotionWebhookHandler([snapshot])
+
+        # Forged or stale events: Notion still has both pages in the tips database
+        assert handler.handle(event("page.deleted", "page-0")) == "refreshed"
+        assert handler.handle(event("page.moved", "page-1", database_id="made-up-parent")) == "refreshed"
+        assert snapshot.export()["page_order"] == ["page-0", "page-1"]
+        assert fake.counts["page"] == 2
+
+
+def test_page_refresh_reaches_the_mirror(tmp_path):
+    with FakeNotion(pages=3, latency=0) as fake:
+        store = MirrorStore(str(tmp_path / "mirror.sqlite3"))
+        snapshot = warm_snapshot(fake, store=store)
+        handler = webhooks.NotionWebhookHandler([snapshot])
+
+        fake.edit("page-1")
+        handler.handle(event("page.content_updated", "page-1"))
+
+        _, pages = store.load_tips()
+        assert pages["page-1"]["info"][0] == "page-1 tip 0 v1"
+
+
+def test_replay_signs_recorded_events(tmp_path):
+    recorded = [event("page.content_updated", "page-1"), event("page.deleted", "page-2")]
+    path = tmp_path / "events.json"
+    path.write_text(json.dumps(recorded))
+    received = []
+
+    with FakeNotion(pages=0, latency=0) as fake:
+        def route(method, path, body):
+            received.append(body)
+            return {}
+        fake.route = route
+        webhooks.replay(str(path), f"{fake.url}/webhooks/notion", secret="s3cret")
+
+    assert received == recorded
+    body = json.dumps(recorded[0]).encode()
+    assert webhooks.verify_signature(body, webhooks.sign(body, "s3cret"), "s3cret")
+    assert not webhooks.verify_signature(body, webhooks.sign(body, "other"), "s3cret")
+    assert not webhooks.verify_signature(body, None, "s3cret")
+
+
+def test_edits_from_other_workers_are_not_lost(tmp_path):
+    with FakeNotion(pages=2, latency=0) as fake:
+        path = str(tmp_path / "mirror.sqlite3")
+        first = warm_snapshot(fake, store=MirrorStore(path))
+        second = knowledge.TipsSnapshot(fake.client(), fake.database_id, store=MirrorStore(path))
+        second.ensure_fresh()
+        synced_at = first.store.synced_at("tips")
+
+        # Each worker applies one event; the second must build on the first one's edit
+        fake.pages = 3
+        webhooks.NotionWebhookHandler([first]).handle(event("page.created", "page-2"))
+        fake.delete("page-0")
+        webhooks.NotionWebhookHandler([second]).handle(event("page.deleted", "page-0"))
+
+        assert second.export()["page_order"] == ["page-1", "page-2"]
+        assert first.store.load_tips()[0] == ["page-1", "page-2"]
+        # Edits don't count as a sync, so the TTLs still run from the last full sync
+        assert first.store.synced_at("tips") == synced_at
+        first.ensure_fresh()
+        assert first.export()["page_order"] == ["page-1", "page-2"]
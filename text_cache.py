@@ -0,0 +1,200 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+
+import requests
+
+from knowledge import single_flight
+from pdf_text import download_pdf, extract_text_from_bytes
+
+# Extracted PDF text kept on disk, shared by every worker on the host; empty keeps it in memory only
+TEXT_CACHE_DIR = os.getenv(
+    'TEXT_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'text_cache'),
+)
+# Extracted texts held in memory per process
+TEXT_CACHE_ENTRIES = int(os.getenv('TEXT_CACHE_ENTRIES', 128))
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def source_key(file_url, s3_bucket=None):
+    """
+    A stable name for a PDF we can look up before downloading it.
+
+    Files we uploaded are named by their S3 object key. Notion-hosted file
+    URLs are re-signed on every read, but the path (unique per upload) stays
+    the same, so the query string is dropped.
+    """
+    parts = urlsplit(file_url)
+    if s3_bucket and parts.hostname and parts.hostname.startswith(f"{s3_bucket}.s3."):
+        return f"s3:{s3_bucket}/{unquote(parts.path.lstrip('/'))}"
+    return f"url:{parts.hostname}{parts.path}"
+
+
+class TextCache:
+    """
+    Content-addressed cache of extracted PDF text.
+
+    Texts are stored by the SHA-256 of the PDF bytes, so the same file reached
+    through different URLs is parsed once. Source keys (see `source_key`)
+    point at a content hash, which lets a repeat lookup skip the download as
+    well. Both live in an in-memory LRU in front of files under `directory`.
+
+    `fetch_sidecar(key)` may return (content hash, text) stored next to the
+    original file, e.g. by the upload job; it is tried before downloading.
+    """
+
+    def __init__(self, directory=TEXT_CACHE_DIR, max_entries=TEXT_CACHE_ENTRIES, fetch_sidecar=None):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.fetch_sidecar = fetch_sidecar
+        self._texts = OrderedDict()  # content hash -> text
+        self._sources = OrderedDict()  # source key -> content hash
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sidecar_hits": 0, "downloads": 0,
+                       "extractions": 0}
+        if directory:
+            os.makedirs(os.path.join(directory, "texts"), exist_ok=True)
+            os.makedirs(os.path.join(directory, "sources"), exist_ok=True)
+
+    def _path(self, kind, name):
+        return os.path.join(self.directory, kind, name)
+
+    def _write(self, path, text):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def _read(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _remember(self, table, key, value):
+        with self._lock:
+            table[key] = value
+            table.move_to_end(key)
+            while len(table) > self.max_entries:
+                table.popitem(last=False)
+
+    def _lookup(self, table, kind, key, filename):
+        with self._lock:
+            value = table.get(key)
+            if value is not None:
+                table.move_to_end(key)
+                return value, "memory_hits"
+        if self.directory:
+            value = self._read(self._path(kind, filename))
+            if value is not None:
+                self._remember(table, key, value)
+                return value, "disk_hits"
+        return None, None
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def text_for_hash(self, digest):
+        text, tier = self._lookup(self._texts, "texts", digest, f"{digest}.txt")
+        self._count(tier or "misses")
+        return text
+
+    def put_text(self, digest, text):
+        self._remember(self._texts, digest, text)
+        if self.directory:
+            self._write(self._path("texts", f"{digest}.txt"), text)
+
+    def hash_for_source(self, key):
+        digest, _ = self._lookup(self._sources, "sources", key, content_hash(key.encode()))
+        return digest
+
+    def set_source(self, key, digest):
+        """
+        Point a source key at a content hash, e.g. after re-uploading a file under the same S3 key.
+        """
+        self._remember(self._sources, key, digest)
+        if self.directory:
+            self._write(self._path("sources", content_hash(key.encode())), digest)
+
+    def text_for_source(self, key):
+        digest = self.hash_for_source(key)
+        return self.text_for_hash(digest) if digest else None
+
+    def _point_source(self, key, digest, expected=None):
+        """
+        Point `key` at `digest` unless it was repointed to other content since we
+        read `expected`, e.g. by a re-upload while the old file was downloading.
+        """
+        if self.hash_for_source(key) in (expected, digest):
+            self.set_source(key, digest)
+
+    def extract(self, file_url, key=None):
+        """
+        Return the text of the PDF at `file_url`, downloading and parsing it only if
+        neither its source key nor its content hash is cached. Returns None if the
+        download fails.
+        """
+        key = key or source_key(file_url)
+        text = self.text_for_source(key)
+        if text is not None:
+            return text
+        try:
+            return single_flight.do((id(self), "pdf-text", key), self._extract, file_url, key)[1]
+        except requests.exceptions.RequestException as e:
+            print(f"Error downloading PDF file: {e}")
+            return None
+
+    def _extract(self, file_url, key):
+        sidecar = self.fetch_sidecar(key) if self.fetch_sidecar else None
+        expected = self.hash_for_source(key)
+        # A sidecar left from an earlier upload under the same key doesn't count
+        if sidecar is not None and expected in (None, sidecar[0]):
+            digest, text = sidecar
+            self._count("sidecar_hits")
+            self.put_text(digest, text)
+            self._point_source(key, digest, expected)
+            return digest, text
+        data = download_pdf(file_url)
+        self._count("downloads")
+        digest, text = self.text_for_data(data)
+        self._point_source(key, digest, expected)
+        return digest, text
+
+    def text_for_data(self, data):
+        """
+        Return (content hash, text) for PDF `data`, parsing it unless the same content was parsed before.
+        """
+        digest = content_hash(data)
+        return digest, single_flight.do((id(self), "pdf-bytes", digest), self._text_for_data, digest, data)
+
+    def _text_for_data(self, digest, data):
+        text = self.text_for_hash(digest)
+        if text is None:
+            text = extract_text_from_bytes(data)
+            self._count("extractions")
+            self.put_text(digest, text)
+        return text
+
+    def ingest(self, key, data):
+        """
+        Cache the text of PDF `data` (the file behind source `key`). Returns (content hash, text).
+
+        The text always comes from `data` itself, never from a download of `key`
+        that may still be fetching an older file. `key` is pointed at it unless
+        it already points at newer content.
+        """
+        digest, text = self.text_for_data(data)
+        self._point_source(key, digest)
+        return digest, text
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._stats, texts_in_memory=len(self._texts), sources_in_memory=len(self._sources))
@@ -0,0 +1,139 @@
+"""
+Notion webhook receiver: refresh only the cache entries a change event touches.
+
+Subscribe an integration webhook to page events and point it at
+`/webhooks/notion`. Notion first POSTs a `verification_token`, which is
+logged; set it as NOTION_WEBHOOK_SECRET so later events are checked against
+their `X-Notion-Signature` header. Until it is set, events are refused.
+
+Recorded events can be replayed against a running app (or a local stand-in):
+
+    python webhooks.py replay events.json [--url http://localhost:5000/webhooks/notion]
+
+where events.json holds a list of event payloads.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from notion_api import BACKGROUND, normalize_id
+
+# Verification token Notion sent when the subscription was created
+NOTION_WEBHOOK_SECRET = os.getenv('NOTION_WEBHOOK_SECRET', '')
+
+PAGE_REFRESH_EVENTS = {
+    "page.created", "page.content_updated", "page.properties_updated", "page.undeleted", "page.moved",
+}
+PAGE_REMOVE_EVENTS = {"page.deleted"}
+
+
+def sign(body, secret):
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, signature, secret):
+    return bool(signature) and hmac.compare_digest(sign(body, secret), signature)
+
+
+class NotionWebhookHandler:
+    """
+    Maps Notion page events onto the snapshots that hold the page.
+
+    Events only say which page changed, so the page is refetched (one page
+    retrieve plus its blocks for tips pages) instead of re-querying the whole
+    database. The payload is never trusted on its own: a page is only dropped
+    after Notion itself reports it gone, trashed or under another parent.
+    `dispatch` runs the refresh on a background thread, since Notion expects a
+    quick response and retries deliveries that time out.
+    """
+
+    def __init__(self, snapshots, max_workers=2):
+        self.snapshots = list(snapshots)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="notion-webhook")
+
+    def _snapshot_for_database(self, database_id):
+        for snapshot in self.snapshots:
+            if database_id and normalize_id(snapshot.database_id) == normalize_id(database_id):
+                return snapshot
+        return None
+
+    def handle(self, event):
+        """
+        Apply one event. Returns a short description of what was done.
+        """
+        kind = event.get("type", "")
+        entity = event.get("entity") or {}
+        page_id = entity.get("id")
+        if entity.get("type") != "page" or not page_id:
+            return "ignored"
+
+        if kind not in PAGE_REFRESH_EVENTS and kind not in PAGE_REMOVE_EVENTS:
+            return "ignored"
+
+        # Snapshots holding the page, plus the one the event says it now belongs to.
+        # Each refetches it, keeping it only if Notion still has it under that database.
+        parent = (event.get("data") or {}).get("parent") or {}
+        candidates = [snapshot for snapshot in self.snapshots if snapshot.has_page(page_id)]
+        target = self._snapshot_for_database(parent.get("id"))
+        if target is not None and target not in candidates:
+            candidates.append(target)
+        if not candidates:
+            return "ignored"
+
+        kept = [snapshot.refresh_page(page_id, priority=BACKGROUND) for snapshot in candidates]
+        if any(kept):
+            return "refreshed"
+        return f"removed from {len(candidates)} snapshot(s)"
+
+    def dispatch(self, event):
+        """
+        Queue an event to be applied in the background.
+        """
+        return self._executor.submit(self._handle_logged, event)
+
+    def _handle_logged(self, event):
+        start = time.monotonic()
+        try:
+            result = self.handle(event)
+        except Exception as e:
+            print(f"⚠️ Warning: Notion webhook {event.get('type')} failed: {e}")
+            return "failed"
+        print(f"🔔 Notion webhook {event.get('type')} for {(event.get('entity') or {}).get('id')}: "
+              f"{result} in {(time.monotonic() - start) * 1000:.0f} ms")
+        return result
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def replay(path, url, secret=NOTION_WEBHOOK_SECRET):
+    """
+    POST recorded events to a webhook URL, signed like Notion would sign them.
+    """
+    with open(path) as f:
+        events = json.load(f)
+    with httpx.Client(timeout=10) as client:
+        for event in events:
+            body = json.dumps(event).encode()
+            headers = {"Content-Type": "application/json"}
+            if secret:
+                headers["X-Notion-Signature"] = sign(body, secret)
+            response = client.post(url, content=body, headers=headers)
+            print(f"{event.get('type')}: {response.status_code}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="replay recorded events against a webhook URL")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--url", default="http://localhost:5000/webhooks/notion")
+    args = parser.parse_args()
+
+    replay(args.path, args.url)